@@ -217,8 +217,6 @@ def get_user_daily_requests_count(user_id: int) -> int:
     try:
         from datetime import date, datetime
 
-        from .database import db_manager
-
         with db_manager.get_session() as session:
             from .models import RequestLog
 
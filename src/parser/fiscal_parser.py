@@ -243,7 +243,7 @@ class FiscalParser:
 
     def _parse_html_content(self, html_content: str) -> SerbianFiscalData:
         """Парсинг HTML контента"""
-        soup = BeautifulSoup(html_content, "html.parser")
+        soup = BeautifulSoup(html_content, "lxml")
 
         # Извлекаем основные данные
         data = {
@@ -2,17 +2,68 @@
 Менеджер логирования с ежедневными файлами и автоудалением старых логов
 """
 
+import errno
+import functools
 import glob
 import logging
+import logging.handlers
 import os
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
+# Сколько записей копится в памяти до сброса в файл (ERROR и выше сбрасываются сразу)
+LOG_BUFFER_CAPACITY = 512
+
+# Не дольше скольких секунд запись ждет в буфере: редкие INFO/DEBUG тоже быстро попадают в файл
+LOG_FLUSH_INTERVAL = 2.0
+
+# Сколько секунд считается верным результат проверки прав на папку логов
+WRITE_CHECK_TTL = 5.0
+
+# Общий форматтер для всех обработчиков: формат разбирается один раз
+_LOG_FORMATTER = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+# Дата в имени ежедневного лога: bot_2025-09-27.log -> 2025-09-27
+_LOG_DATE_RE = re.compile(r"_(\d{4}-\d{2}-\d{2})\.log$")
+
+# Флаг безымянного временного файла (только Linux) и ошибки ФС, которые его не поддерживают
+_O_TMPFILE = getattr(os, "O_TMPFILE", 0)
+_O_TMPFILE_UNSUPPORTED = (errno.EOPNOTSUPP, errno.EISDIR, errno.EINVAL)
+
+# Сколько буферов принимает один вызов os.writev
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+
+# Поток для фоновой очистки старых логов, чтобы чтение папки и медленный unlink не задерживали запуск
+_CLEANUP_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-cleanup")
+
 
 class LogManager:
     """Менеджер для управления логами с ежедневными файлами"""
 
+    # Кэш строки текущей даты и момент (timestamp) локальной полуночи, до которого она верна
+    _cached_date_str: str = ""
+    _date_valid_until: float = 0.0
+    # Результат проверки прав на запись в папку логов и момент (time.monotonic) до которого он верен
+    _write_ok: bool = False
+    _write_ok_until: float = float("-inf")
+    # Дата последней фоновой очистки
+    _last_auto_cleanup_date: str = ""
+    # Незавершенная фоновая очистка
+    _pending_cleanup: tuple[Future, ...] = ()
+
     def __init__(self, log_dir: Path, retention_days: int = 30):
         """
         Инициализация менеджера логов
@@ -23,10 +74,33 @@ class LogManager:
         """
         self.log_dir = log_dir
         self.retention_days = retention_days
-        self.log_dir.mkdir(exist_ok=True)
-
-        # Очищаем старые логи при инициализации
-        self.cleanup_old_logs()
+        # Обработчики очереди, которые этот менеджер подключил к логгерам с файловым логом, по имени логгера
+        self._configured_loggers: dict[str, logging.Handler] = {}
+        self._ensure_log_dir()
+
+        # Очищаем старые логи в фоне: инициализация не ждет ни чтения папки, ни удаления файлов
+        self.cleanup_old_logs(wait=False)
+
+    @property
+    def log_dir(self) -> Path:
+        """Папка для хранения логов"""
+        return self._log_dir
+
+    @log_dir.setter
+    def log_dir(self, value: Path) -> None:
+        # Строковый путь держим рядом с Path: внутренние операции работают со строками
+        self._log_dir_str = os.fspath(value)
+        self._log_dir = Path(self._log_dir_str)
+        # Пути к файлам текущего дня по типам лога; сбрасываются при смене папки и даты
+        self._daily_paths: dict[str, Path] = {}
+
+    def _ensure_log_dir(self) -> None:
+        """Создать папку логов, если ее нет; для существующей папки mkdir не вызывается"""
+        if not os.path.isdir(self._log_dir_str):
+            try:
+                os.mkdir(self._log_dir_str)
+            except FileExistsError:
+                pass
 
     def get_daily_log_file(self, log_type: str = "bot") -> Path:
         """
@@ -38,9 +112,26 @@ class LogManager:
         Returns:
             Path к файлу лога
         """
-        today = datetime.now().strftime("%Y-%m-%d")
-        filename = f"{log_type}_{today}.log"
-        return self.log_dir / filename
+        # Обновляем дату; после полуночи это сбрасывает кэш путей
+        self._today_str()
+        path = self._daily_paths.get(log_type)
+        if path is None:
+            path = self._daily_paths[log_type] = Path(self._get_daily_log_str(log_type))
+        return path
+
+    def _get_daily_log_str(self, log_type: str) -> str:
+        """Путь к файлу лога для текущего дня в виде строки, без создания Path"""
+        return os.path.join(self._log_dir_str, f"{log_type}_{self._today_str()}.log")
+
+    def _today_str(self) -> str:
+        """Строка текущей даты; пересчитывается один раз в сутки, после локальной полуночи"""
+        if time.time() >= self._date_valid_until:
+            now = datetime.now()
+            next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            self._cached_date_str = now.strftime("%Y-%m-%d")
+            self._daily_paths = {}
+            self._date_valid_until = next_midnight.timestamp()
+        return self._cached_date_str
 
     def can_write_to_log_dir(self) -> bool:
         """
@@ -49,14 +140,13 @@ class LogManager:
         Returns:
             True если можем писать, False если нет
         """
-        try:
-            # Проверяем права на запись
-            test_file = self.log_dir / "test_write.tmp"
-            test_file.touch()
-            test_file.unlink()
-            return True
-        except Exception:
-            return False
+        # Результат кэшируется на WRITE_CHECK_TTL секунд: частые вызовы не обращаются к ФС,
+        # а смена прав (например, перемонтирование тома) все равно будет замечена.
+        now = time.monotonic()
+        if now >= self._write_ok_until:
+            self._write_ok = _probe_dir_writable(self._log_dir_str)
+            self._write_ok_until = now + WRITE_CHECK_TTL
+        return self._write_ok
 
     def get_writable_file_path(self, filename: str) -> Optional[Path]:
         """
@@ -69,7 +159,7 @@ class LogManager:
             Path если можем писать, None если нет
         """
         if self.can_write_to_log_dir():
-            return self.log_dir / filename
+            return Path(os.path.join(self._log_dir_str, filename))
         return None
 
     def setup_logging(self, log_type: str = "bot", level: int = logging.DEBUG) -> logging.Logger:
@@ -83,45 +173,64 @@ class LogManager:
         Returns:
             Настроенный логгер
         """
+        # Повторная настройка того же логгера только меняет уровень, файл заново не открывается
+        logger = logging.getLogger(log_type)
+        configured_handler = self._configured_loggers.get(log_type)
+        if configured_handler is not None and logger.handlers:
+            logger.setLevel(level)
+            configured_handler.setLevel(level)
+            return logger
+
         # Получаем путь к файлу лога
-        log_file = self.get_daily_log_file(log_type)
+        log_file = self._get_daily_log_str(log_type)
 
         # Убеждаемся, что папка существует и доступна для записи
         try:
-            self.log_dir.mkdir(exist_ok=True)
-            # Проверяем права на запись
-            test_file = self.log_dir / "test_write.tmp"
-            test_file.touch()
-            test_file.unlink()
+            self._ensure_log_dir()
         except Exception as e:
             print(f"Ошибка доступа к папке логов {self.log_dir}: {e}")
             # Если не можем писать в файл, используем только консоль
             return self._setup_console_only_logging(log_type, level)
+        if not self.can_write_to_log_dir():
+            print(f"Нет прав на запись в папку логов {self.log_dir}")
+            return self._setup_console_only_logging(log_type, level)
 
-        # Создаем логгер
-        logger = logging.getLogger(log_type)
         logger.setLevel(level)
 
-        # Очищаем существующие обработчики
-        logger.handlers.clear()
+        # Закрываем существующие обработчики, чтобы буферы не потерялись
+        self._close_handlers(logger)
 
-        # Создаем форматтер
-        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        # Обработчики за очередью не фильтруют по уровню: уровень проверяет обработчик очереди
+        handlers = []
 
         # Обработчик для файла
+        file_logging = False
         try:
-            file_handler = logging.FileHandler(log_file, encoding="utf-8")
-            file_handler.setLevel(level)
-            file_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
+            file_handler = DailyLogFileHandler(self, log_type)
+            file_handler.setFormatter(_LOG_FORMATTER)
+            # Копим записи в памяти и пишем в файл пачкой, а не по одной, но не реже раза в LOG_FLUSH_INTERVAL
+            buffered_handler = BufferedLogHandler(
+                LOG_BUFFER_CAPACITY,
+                flushLevel=logging.ERROR,
+                target=file_handler,
+                flushOnClose=True,
+            )
+            handlers.append(buffered_handler)
+            file_logging = True
         except Exception as e:
             print(f"Не удалось создать файловый обработчик для {log_file}: {e}")
 
         # Обработчик для консоли
         console_handler = logging.StreamHandler()
-        console_handler.setLevel(level)
-        console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        console_handler.setFormatter(_LOG_FORMATTER)
+        handlers.append(console_handler)
+
+        # Вызывающий поток только кладет запись в очередь, запись в файл и консоль идет в фоновом потоке
+        queue_handler = QueueLogHandler(*handlers)
+        queue_handler.setLevel(level)
+        logger.addHandler(queue_handler)
+        if file_logging:
+            self._configured_loggers[log_type] = queue_handler
 
         # Отключаем распространение на корневой логгер
         logger.propagate = False
@@ -132,60 +241,97 @@ class LogManager:
         """Настроить логирование только в консоль"""
         logger = logging.getLogger(log_type)
         logger.setLevel(level)
-        logger.handlers.clear()
-
-        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        self._close_handlers(logger)
 
         console_handler = logging.StreamHandler()
         console_handler.setLevel(level)
-        console_handler.setFormatter(formatter)
+        console_handler.setFormatter(_LOG_FORMATTER)
         logger.addHandler(console_handler)
 
         logger.propagate = False
         return logger
 
-    def cleanup_old_logs(self) -> int:
+    @staticmethod
+    def _close_handlers(logger: logging.Logger) -> None:
+        """Снять и закрыть обработчики логгера (буферизованные записи сбрасываются в файл)"""
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+            handler.close()
+
+    def close(self) -> None:
+        """Закрыть обработчики логгеров, настроенных этим менеджером, дописав накопленные записи"""
+        for log_type in self._configured_loggers:
+            self._close_handlers(logging.getLogger(log_type))
+        self._configured_loggers.clear()
+
+    def cleanup_old_logs(self, wait: bool = True) -> int:
         """
         Удалить старые файлы логов
 
+        Args:
+            wait: Выполнить очистку сразу; если False, она уходит в фоновый поток
+
         Returns:
-            Количество удаленных файлов
+            Количество удаленных файлов (при wait=False - 0, результат не ожидается)
         """
-        if not self.log_dir.exists():
+        # Фоновая очистка (при запуске и после полуночи у каждого логгера) нужна не чаще раза в день
+        if not wait:
+            today = self._today_str()
+            if today != self._last_auto_cleanup_date:
+                self._last_auto_cleanup_date = today
+                self._pending_cleanup = (_CLEANUP_POOL.submit(self.cleanup_old_logs),)
             return 0
 
-        try:
-            # Проверяем на слишком большие значения retention_days
-            if self.retention_days > 365000:  # Больше 1000 лет
-                return 0
-
-            # Вычисляем дату, до которой удаляем файлы
-            cutoff_date = datetime.now() - timedelta(days=self.retention_days)
-        except (OverflowError, ValueError):
-            # Если значение слишком большое, просто не удаляем ничего
+        if not os.path.exists(self._log_dir_str):
             return 0
 
-        deleted_count = 0
+        # Время изменения (целые секунды), раньше которого файлы считаются устаревшими.
+        # Не раньше начала эпохи: так дата отсечки для имен файлов всегда представима
+        cutoff = max(int(time.time()) - int(self.retention_days) * 86400, 0)
 
-        # Ищем все файлы логов
-        log_pattern = str(self.log_dir / "*.log")
-        log_files = glob.glob(log_pattern)
+        # Срок хранения длиннее возраста эпохи - устареть ничего не может, папку не читаем
+        if cutoff <= 0:
+            return 0
 
-        for log_file in log_files:
-            try:
-                # Получаем дату создания файла
-                file_time = datetime.fromtimestamp(os.path.getctime(log_file))
+        # Сравниваем с st_mtime_ns: целые числа без преобразования времени файла во float
+        cutoff_ns = cutoff * 1_000_000_000
 
-                # Если файл старше cutoff_date, удаляем его
-                if file_time < cutoff_date:
-                    os.remove(log_file)
-                    deleted_count += 1
+        # Дата отсечки для имен файлов; в файл с более поздней датой в имени писали уже после отсечки
+        try:
+            cutoff_date = datetime.fromtimestamp(cutoff).strftime("%Y-%m-%d")
+        except (OverflowError, OSError, ValueError):
+            cutoff_date = None
 
-            except (OSError, ValueError):
-                # Игнорируем ошибки при удалении файлов
-                continue
+        old_entries: list[os.DirEntry] = []
 
-        return deleted_count
+        # Один проход scandir: имя и stat берутся из записи каталога без отдельного поиска файлов
+        with os.scandir(self._log_dir_str) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".log"):
+                    continue
+                # Свежие ежедневные логи отсеиваем по имени, не вызывая stat
+                date_match = _LOG_DATE_RE.search(entry.name)
+                if date_match and cutoff_date and date_match.group(1) > cutoff_date:
+                    continue
+                try:
+                    # Удаляем только обычные файлы; возраст лога определяем по последней записи в него
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    if entry.stat(follow_symlinks=False).st_mtime_ns < cutoff_ns:
+                        old_entries.append(entry)
+                except OSError:
+                    continue
+
+        # Удаление зависит от прав на папку, а не на сами файлы: без них не пытаемся удалять каждый файл
+        if not old_entries or not self.can_write_to_log_dir():
+            return 0
+
+        return _unlink_batch(self._log_dir_str, old_entries)
+
+    def wait_for_cleanup(self) -> None:
+        """Дождаться завершения фоновой очистки старых логов"""
+        wait_futures(self._pending_cleanup)
+        self._pending_cleanup = ()
 
     def get_log_files(self, log_type: Optional[str] = None) -> list[Path]:
         """
@@ -197,7 +343,7 @@ class LogManager:
         Returns:
             Список путей к файлам логов
         """
-        if not self.log_dir.exists():
+        if not os.path.exists(self._log_dir_str):
             return []
 
         if log_type:
@@ -205,7 +351,7 @@ class LogManager:
         else:
             pattern = "*.log"
 
-        log_pattern = str(self.log_dir / pattern)
+        log_pattern = os.path.join(self._log_dir_str, pattern)
         return [Path(f) for f in glob.glob(log_pattern)]
 
     def get_log_stats(self) -> dict:
@@ -216,24 +362,34 @@ class LogManager:
             Словарь со статистикой
         """
         try:
-            log_files = self.get_log_files()
-
-            total_files = len(log_files)
-            total_size = sum(f.stat().st_size for f in log_files if f.exists())
+            # Счетчики по типам: [количество, размер]; вложенные словари собираем один раз в конце
+            totals: defaultdict[str, list[int]] = defaultdict(lambda: [0, 0])
+            total_files = 0
+            total_size = 0
+
+            # Один проход scandir: размер берем из записи каталога без повторного поиска файлов
+            with os.scandir(self._log_dir_str) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".log"):
+                        continue
+                    try:
+                        # Считаем только обычные файлы: тип известен из записи каталога без отдельного stat
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        size = entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
 
-            # Группируем по типам
-            types = {}
-            for log_file in log_files:
-                try:
                     # Извлекаем тип из имени файла (например, bot_2025-09-27.log -> bot)
-                    type_name = log_file.stem.split("_")[0]
-                    if type_name not in types:
-                        types[type_name] = {"count": 0, "size": 0}
-                    types[type_name]["count"] += 1
-                    if log_file.exists():
-                        types[type_name]["size"] += log_file.stat().st_size
-                except (OSError, IndexError):
-                    continue
+                    type_name = entry.name[:-4].partition("_")[0]
+                    type_totals = totals[type_name]
+                    type_totals[0] += 1
+                    type_totals[1] += size
+                    # Общие итоги считаем в том же проходе, без повторного обхода счетчиков
+                    total_files += 1
+                    total_size += size
+
+            types = {type_name: {"count": count, "size": size} for type_name, (count, size) in totals.items()}
 
             return {
                 "total_files": total_files,
@@ -252,16 +408,266 @@ class LogManager:
             }
 
 
-def get_log_manager() -> LogManager:
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """QueueHandler со своим QueueListener: переданные обработчики работают в фоновом потоке"""
+
+    def __init__(self, *handlers: logging.Handler):
+        super().__init__(queue.SimpleQueue())
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def close(self) -> None:
+        """Дождаться обработки очереди и закрыть обработчики за ней"""
+        with self.lock:
+            listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+            for handler in listener.handlers:
+                # MemoryHandler при закрытии сбрасывает буфер и забывает target, поэтому берем его заранее
+                target = getattr(handler, "target", None)
+                handler.close()
+                if target is not None:
+                    target.close()
+        super().close()
+
+
+class BufferedLogHandler(logging.handlers.MemoryHandler):
+    """
+    MemoryHandler, который после передачи пачки записей сбрасывает буфер файла один раз на всю пачку
+
+    Кроме переполнения буфера и записи уровня flushLevel, буфер сбрасывается по таймеру:
+    первая запись в пустой буфер ждет не дольше flush_interval секунд.
     """
-    Получить экземпляр менеджера логов с настройками из окружения
+
+    def __init__(self, *args, flush_interval: Optional[float] = None, **kwargs):
+        """
+        Args:
+            flush_interval: Наибольшая задержка записи в буфере, секунды (по умолчанию LOG_FLUSH_INTERVAL)
+        """
+        super().__init__(*args, **kwargs)
+        self.flush_interval = LOG_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self._flush_timer: Optional[threading.Timer] = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)
+        # Запись осталась в буфере - запускаем таймер сброса, если он еще не идет
+        if self.buffer and self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self) -> None:
+        with self.lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            # flush вызывается и из потока QueueListener, и из таймера: ошибка не должна выйти наружу
+            try:
+                super().flush()
+                if self.target:
+                    self.target.flush()
+            except Exception:
+                # Не даем буферу расти при повторяющихся ошибках: сообщаем о потерянных записях
+                lost = len(self.buffer)
+                self.buffer.clear()
+                self.handleError(
+                    logging.makeLogRecord({"msg": "Не удалось сбросить буфер лога (%d записей)", "args": (lost,)})
+                )
+
+    def close(self) -> None:
+        super().close()
+        # При flushOnClose=False буфер не сбрасывается, но таймер все равно не нужен
+        with self.lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+
+
+class DailyLogFileHandler(logging.FileHandler):
+    """
+    Файловый обработчик, который после локальной полуночи переходит на файл нового дня
+
+    Записи копятся уже закодированными в байты и пишутся в файл одним os.writev при flush()
+    (его вызывает BufferedLogHandler после каждой пачки) или close().
+
+    Если файл дня вырастает больше max_bytes, он переименовывается в <type>_<date>.<n>.log
+    и запись продолжается в новый файл. Размер проверяется раз в sample_every записей.
+    """
+
+    max_bytes = 10 * 1024 * 1024
+    sample_every = 64
+
+    def __init__(self, log_manager: LogManager, log_type: str):
+        """
+        Args:
+            log_manager: Менеджер, определяющий имя файла и срок хранения логов
+            log_type: Тип лога (bot, parser, requests, etc.)
+        """
+        self.log_manager = log_manager
+        self.log_type = log_type
+        # Файл открывается при первой записи: для молчащих логгеров пустые файлы не создаются
+        super().__init__(log_manager._get_daily_log_str(log_type), encoding="utf-8", delay=True)
+        self._rollover_at = log_manager._date_valid_until
+        self._records_since_size_check = 0
+        # Закодированные записи, еще не записанные в файл
+        self._pending: list[bytes] = []
+
+    def _open(self):
+        # Небуферизованный двоичный файл в режиме дозаписи: каждый flush - один системный вызов
+        return open(self.baseFilename, "ab", buffering=0)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Ошибки открытия файла (например, удаленная папка логов) сообщаются через handleError, а не
+        # выходят из emit: иначе они остановили бы поток QueueListener и все логирование за ним
+        try:
+            # Проверка ротации - одно сравнение чисел на запись
+            if record.created >= self._rollover_at:
+                self._rollover()
+            if self.stream is None:
+                # После close() файл заново не открываем
+                if self._closed:
+                    return
+                self.stream = self._open()
+            self._pending.append((self.format(record) + self.terminator).encode(self.encoding, self.errors or "strict"))
+
+            # Размер узнаем через fstat открытого файла, и только раз в sample_every записей
+            self._records_since_size_check += 1
+            if self._records_since_size_check >= self.sample_every:
+                self._records_since_size_check = 0
+                self.flush()
+                if self.stream and os.fstat(self.stream.fileno()).st_size >= self.max_bytes:
+                    self._rotate_by_size()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        """Записать накопленные записи в файл; ошибка записи сообщается через handleError, а не выбрасывается"""
+        with self.lock:
+            if self._pending and self.stream:
+                pending, self._pending = self._pending, []
+                try:
+                    _write_all(self.stream.fileno(), pending)
+                except OSError:
+                    # Пачка потеряна (например, ENOSPC): сообщаем, сколько записей не попало в файл
+                    self.handleError(
+                        logging.makeLogRecord(
+                            {
+                                "msg": "Не удалось записать %d записей лога в %s",
+                                "args": (len(pending), self.baseFilename),
+                            }
+                        )
+                    )
+
+    def _rotate_by_size(self) -> None:
+        """Переименовать переполненный файл дня в первый свободный <type>_<date>.<n>.log"""
+        self.flush()
+        self.stream.close()
+        self.stream = None
+        base, ext = os.path.splitext(self.baseFilename)
+        index = 1
+        while os.path.exists(f"{base}.{index}{ext}"):
+            index += 1
+        try:
+            os.rename(self.baseFilename, f"{base}.{index}{ext}")
+        except OSError:
+            # Не удалось переименовать - продолжаем писать в тот же файл
+            pass
+
+    def _rollover(self) -> None:
+        """Закрыть файл прошедшего дня; файл нового дня откроется при следующей записи"""
+        if self.stream:
+            self.flush()
+            self.stream.close()
+            self.stream = None
+        self.baseFilename = os.path.abspath(self.log_manager._get_daily_log_str(self.log_type))
+        self._rollover_at = self.log_manager._date_valid_until
+        # Заодно убираем логи, у которых истек срок хранения
+        self.log_manager.cleanup_old_logs(wait=False)
+
+
+def _probe_dir_writable(dir_path: str) -> bool:
+    """
+    Проверить, можно ли создавать файлы в папке
+
+    Где есть O_TMPFILE, в папке открывается безымянный временный файл: это настоящая попытка записи
+    от имени эффективного пользователя, а после закрытия от нее ничего не остается.
+    Если ФС не поддерживает O_TMPFILE, права проверяются через os.access.
+    """
+    if _O_TMPFILE:
+        try:
+            os.close(os.open(dir_path, _O_TMPFILE | os.O_WRONLY, 0o600))
+            return True
+        except OSError as e:
+            if e.errno not in _O_TMPFILE_UNSUPPORTED:
+                return False
+    return os.access(dir_path, os.W_OK | os.X_OK, effective_ids=os.access in os.supports_effective_ids)
+
+
+def _write_all(fd: int, chunks: list[bytes]) -> None:
+    """
+    Записать куски байтов в файл
+
+    Где есть os.writev, куски уходят одним системным вызовом на каждые IOV_MAX кусков
+    без склейки в общий буфер; после частичной записи остаток дописывается.
+    """
+    if not hasattr(os, "writev"):
+        os.write(fd, b"".join(chunks))
+        return
+
+    for start in range(0, len(chunks), _IOV_MAX):
+        batch = chunks[start : start + _IOV_MAX]
+        written = os.writev(fd, batch)
+        expected = sum(len(chunk) for chunk in batch)
+        if written < expected:
+            rest = memoryview(b"".join(batch))[written:]
+            while rest:
+                rest = rest[os.write(fd, rest) :]
+
+
+def _unlink_batch(dir_path: str, entries: list[os.DirEntry]) -> int:
+    """
+    Удалить файлы из одной папки пакетом, игнорируя ошибки
+
+    Папка открывается один раз, и файлы удаляются относительно ее дескриптора,
+    так что ядро не разбирает полный путь для каждого файла. Без dir_fd используется
+    готовый путь из записи scandir.
 
     Returns:
-        Настроенный LogManager
+        Количество удаленных файлов
     """
-    import os
-    from pathlib import Path
+    dir_fd = None
+    if os.unlink in os.supports_dir_fd:
+        try:
+            dir_fd = os.open(dir_path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+        except OSError:
+            dir_fd = None
+
+    deleted_count = 0
+    try:
+        for entry in entries:
+            try:
+                if dir_fd is None:
+                    os.unlink(entry.path)
+                else:
+                    os.unlink(entry.name, dir_fd=dir_fd)
+                deleted_count += 1
+            except OSError:
+                continue
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    return deleted_count
+
+
+# Защищает создание общего менеджера логов от гонки при первом вызове из нескольких потоков
+_LOG_MANAGER_LOCK = threading.Lock()
 
+
+@functools.lru_cache(maxsize=1)
+def _build_log_manager() -> LogManager:
+    """Создать менеджер логов с настройками из окружения"""
     # Определяем путь к логам в зависимости от окружения
     if os.getenv("DOCKER_ENV") or (os.path.exists("/app") and os.path.exists("/app/bot_tg")):
         log_dir = Path("/app/log")
@@ -270,7 +676,36 @@ def get_log_manager() -> LogManager:
         current_dir = Path(__file__).parent.parent  # src/
         log_dir = current_dir / "log"
 
-    # Получаем количество дней хранения из переменной окружения
-    retention_days = int(os.getenv("LOG_RETENTION_DAYS", "30"))
+    return LogManager(log_dir, _env_retention_days())
+
+
+@functools.cache
+def _env_retention_days(default: int = 30) -> int:
+    """Количество дней хранения из LOG_RETENTION_DAYS; переменная разбирается один раз за процесс"""
+    raw = os.environ.get("LOG_RETENTION_DAYS")
+    if raw is None:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        return default
+
+
+def get_log_manager() -> LogManager:
+    """
+    Получить общий экземпляр менеджера логов с настройками из окружения
+
+    Экземпляр создается при первом вызове; сбросить его можно через reset_log_manager()
+
+    Returns:
+        Настроенный LogManager
+    """
+    with _LOG_MANAGER_LOCK:
+        return _build_log_manager()
+
 
-    return LogManager(log_dir, retention_days)
+def reset_log_manager() -> None:
+    """Сбросить общий менеджер логов: следующий get_log_manager() создаст новый, заново прочитав окружение"""
+    with _LOG_MANAGER_LOCK:
+        _build_log_manager.cache_clear()
+        _env_retention_days.cache_clear()
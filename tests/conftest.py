@@ -31,13 +31,30 @@ os.environ.update(
     }
 )
 
+# Временные папки логов создаем в tmpfs, если он есть: файловые операции тестов не идут на диск
+FAST_TMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK | os.X_OK) else None
+
+# Группы pytest-xdist: тесты одного файла выполняются на одном воркере (--dist=loadgroup)
+XDIST_GROUPS = {
+    "test_database_manager.py": "db_manager",
+    "test_integration.py": "integration",
+}
+
+
+def pytest_collection_modifyitems(config, items):
+    """Пометить тесты маркером xdist_group по имени файла."""
+    for item in items:
+        group = XDIST_GROUPS.get(item.path.name)
+        if group:
+            item.add_marker(pytest.mark.xdist_group(group))
+
 
 @pytest.fixture
 def temp_log_dir():
     """Создать временную директорию для логов для тестирования."""
     import logging
 
-    temp_dir = tempfile.mkdtemp()
+    temp_dir = tempfile.mkdtemp(dir=FAST_TMP_DIR)
     try:
         yield Path(temp_dir)
     finally:
@@ -87,6 +104,16 @@ def mock_log_manager(temp_log_dir):
         yield mock_instance
 
 
+@pytest.fixture(scope="module")
+def shared_log_manager(tmp_path_factory):
+    """Один LogManager на модуль для тестов, которые его не изменяют."""
+    from utils.log_manager import LogManager
+
+    log_manager = LogManager(log_dir=tmp_path_factory.mktemp("logs"))
+    yield log_manager
+    log_manager.close()
+
+
 @pytest.fixture
 def mock_database():
     """Мок сессии базы данных и операций."""
@@ -96,9 +123,12 @@ def mock_database():
         yield mock_db
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_serbian_data():
-    """Образец сербских фискальных данных для тестирования."""
+    """Образец сербских фискальных данных для тестирования.
+
+    Общий на сессию: тесты не должны менять словарь на месте, только его копию.
+    """
     return {
         "tin": "123456789",
         "shop_name": "Test Shop",
@@ -129,9 +159,20 @@ def sample_serbian_data():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def serbian_fiscal_model(sample_serbian_data):
+    """Провалидированная модель SerbianFiscalData из образца данных."""
+    from models.fiscal_models import SerbianFiscalData
+
+    return SerbianFiscalData(**sample_serbian_data)
+
+
+@pytest.fixture(scope="session")
 def sample_russian_data():
-    """Образец российских фискальных данных для тестирования."""
+    """Образец российских фискальных данных для тестирования.
+
+    Общий на сессию: тесты не должны менять словарь на месте, только его копию.
+    """
     return {
         "_id": "66ce2f2a5b87f45c8a123456",
         "createdAt": "2025-09-27T10:30:00+00:00",
@@ -210,6 +251,15 @@ def mock_selenium_driver():
         yield mock_driver
 
 
+@pytest.fixture
+def mock_fiscal_parser():
+    """Мок FiscalParser: экземпляр, возвращаемый его контекстным менеджером."""
+    with patch("parser.fiscal_parser.FiscalParser") as mock_parser_class:
+        mock_parser = Mock()
+        mock_parser_class.return_value.__enter__.return_value = mock_parser
+        yield mock_parser
+
+
 @pytest.fixture
 def mock_telegram_update():
     """Мок объекта Telegram Update."""
@@ -2,9 +2,14 @@
 Тесты для утилит базы данных в db/utils.py - ИСПРАВЛЕННАЯ ВЕРСИЯ
 """
 
+from collections import namedtuple
 from datetime import datetime
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, create_autospec, patch
 
+import pytest
+
+import db.utils as db_utils
+from db.database import DatabaseManager
 from db.utils import (
     check_daily_limit,
     cleanup_old_logs,
@@ -21,61 +26,103 @@ from db.utils import (
     log_user_request,
 )
 
+# Легковесные строки логов вместо Mock: функции читают только атрибуты
+LogRow = namedtuple("LogRow", "status")
 
-class TestDatabaseInit:
-    """Тесты для инициализации базы данных."""
+# Отметки времени для логов
+_T_10 = datetime(2025, 9, 27, 10, 0)
+_T_11 = datetime(2025, 9, 27, 11, 0)
+_T_LAST_LOG = datetime(2025, 9, 27, 10, 30)
 
-    @patch("db.utils.db_manager")
-    def test_init_database_success(self, mock_db_manager):
-        """Тест успешной инициализации базы данных."""
-        mock_db_manager.check_connection.return_value = True
-        mock_db_manager.init_database.return_value = True
 
-        result = init_database()
+class RecentRow(namedtuple("RecentRow", "timestamp user_id status")):
+    """Строка лога с to_dict(), как у модели RequestLog."""
 
-        assert result is True
-        mock_db_manager.check_connection.assert_called_once()
-        mock_db_manager.init_database.assert_called_once()
+    __slots__ = ()
 
-    @patch("db.utils.time.sleep")
-    @patch("db.utils.time.monotonic")
-    @patch("db.utils.db_manager")
-    def test_init_database_no_connection(self, mock_db_manager, mock_monotonic, mock_sleep):
-        """Тест инициализации базы данных без подключения (таймаут ожидания)."""
-        mock_db_manager.check_connection.return_value = False
-        # deadline=120; два прохода while (0 и 2 < 120), затем 125 — выход без третьей проверки подключения
-        mock_monotonic.side_effect = [0, 0, 2, 125]
+    def to_dict(self):
+        return self._asdict()
 
-        result = init_database()
 
-        assert result is False
-        assert mock_db_manager.check_connection.call_count == 2
-        mock_db_manager.init_database.assert_not_called()
+@pytest.fixture(scope="class")
+def _db_manager_mock():
+    """Один мок db_manager по спецификации DatabaseManager на класс тестов."""
+    return create_autospec(DatabaseManager, instance=True)
 
-    @patch("db.utils.db_manager")
-    def test_init_database_init_failed(self, mock_db_manager):
-        """Тест инициализации базы данных когда init не удается."""
-        mock_db_manager.check_connection.return_value = True
-        mock_db_manager.init_database.return_value = False
 
-        result = init_database()
+@pytest.fixture(autouse=True)
+def mock_db_manager(_db_manager_mock, monkeypatch):
+    """Подставить сброшенный мок db_manager в db.utils только на время теста."""
+    _db_manager_mock.reset_mock(return_value=True, side_effect=True)
+    monkeypatch.setattr(db_utils, "db_manager", _db_manager_mock)
+    return _db_manager_mock
 
-        assert result is False
 
-    @patch("db.utils.db_manager")
-    def test_init_database_exception(self, mock_db_manager):
-        """Тест инициализации базы данных с исключением."""
-        mock_db_manager.check_connection.side_effect = Exception("Connection error")
+@pytest.fixture
+def session_mock(mock_db_manager):
+    """Мок сессии, возвращаемый контекстным менеджером db_manager.get_session()."""
+    session = MagicMock()
+    mock_db_manager.get_session.return_value.__enter__.return_value = session
+    return session
+
+
+@pytest.fixture(scope="session")
+def db_info_session_factory():
+    """Фабрика мока сессии для get_database_info: счётчики и последний лог.
+
+    Возвращает замыкание, а не общий прототип: side_effect со счётчиками
+    расходуется при вызове, и copy.copy разделял бы его между тестами.
+    """
+    last_log_row = namedtuple("LastLogRow", "created_at")
+
+    def build(users_count, logs_count, last_log_time):
+        session = MagicMock()
+        session.query.return_value.count.side_effect = [users_count, logs_count]
+        session.query.return_value.order_by.return_value.first.return_value = last_log_row(last_log_time)
+        return session
+
+    return build
+
+
+class TestDatabaseInit:
+    """Тесты для инициализации базы данных."""
+
+    @pytest.mark.parametrize(
+        "check,init,expected",
+        [
+            (True, True, True),
+            (False, None, False),
+            (True, False, False),
+            (Exception("Connection error"), None, False),
+        ],
+        ids=["success", "no_connection", "init_failed", "exception"],
+    )
+    @patch("db.utils.time.sleep")
+    @patch("db.utils.time.monotonic")
+    def test_init_database(self, mock_monotonic, mock_sleep, check, init, expected, mock_db_manager):
+        """Тест инициализации базы данных: успех, таймаут ожидания, ошибка init и исключение."""
+        # deadline=120; два прохода while (0 и 2 < 120), затем 125 — выход без третьей проверки подключения
+        mock_monotonic.side_effect = [0, 0, 2, 125]
+        if isinstance(check, Exception):
+            mock_db_manager.check_connection.side_effect = check
+        else:
+            mock_db_manager.check_connection.return_value = check
+        mock_db_manager.init_database.return_value = init
 
         result = init_database()
 
-        assert result is False
+        assert result is expected
+        if check is False:
+            assert mock_db_manager.check_connection.call_count == 2
+        if init is None:
+            mock_db_manager.init_database.assert_not_called()
+        else:
+            mock_db_manager.init_database.assert_called_once()
 
 
 class TestRequestLogging:
     """Тесты для функций логирования запросов."""
 
-    @patch("db.utils.db_manager")
     def test_log_user_request_success(self, mock_db_manager):
         """Тест успешного логирования запроса."""
         mock_log = Mock()
@@ -88,7 +135,6 @@ class TestRequestLogging:
             user_id=123, username="test_user", status="success", error_message=None
         )
 
-    @patch("db.utils.db_manager")
     def test_log_user_request_with_error(self, mock_db_manager):
         """Тест логирования запроса с сообщением об ошибке."""
         mock_log = Mock()
@@ -101,7 +147,6 @@ class TestRequestLogging:
             user_id=123, username=None, status="error", error_message="Parse failed"
         )
 
-    @patch("db.utils.db_manager")
     def test_log_user_request_database_error(self, mock_db_manager):
         """Тест логирования запроса с ошибкой базы данных."""
         mock_db_manager.add_request_log.side_effect = Exception("Database error")
@@ -114,10 +159,9 @@ class TestRequestLogging:
 class TestUserStats:
     """Тесты для функций статистики пользователей."""
 
-    @patch("db.utils.db_manager")
     def test_get_user_stats_success(self, mock_db_manager):
         """Тест успешного получения статистики пользователя."""
-        mock_logs = [Mock(status="success"), Mock(status="error"), Mock(status="command"), Mock(status="success")]
+        mock_logs = [LogRow("success"), LogRow("error"), LogRow("command"), LogRow("success")]
         mock_db_manager.get_request_logs.return_value = mock_logs
 
         stats = get_user_stats(123, days=30)
@@ -128,7 +172,6 @@ class TestUserStats:
         assert stats["successful_requests"] == 3  # success + command
         assert stats["failed_requests"] == 1
 
-    @patch("db.utils.db_manager")
     def test_get_user_stats_no_logs(self, mock_db_manager):
         """Тест получения статистики пользователя без логов."""
         mock_db_manager.get_request_logs.return_value = []
@@ -139,7 +182,6 @@ class TestUserStats:
         assert stats["successful_requests"] == 0
         assert stats["failed_requests"] == 0
 
-    @patch("db.utils.db_manager")
     def test_get_user_stats_error(self, mock_db_manager):
         """Тест получения статистики пользователя с ошибкой."""
         mock_db_manager.get_request_logs.side_effect = Exception("Database error")
@@ -152,7 +194,6 @@ class TestUserStats:
 class TestSystemStats:
     """Тесты для функций статистики системы."""
 
-    @patch("db.utils.db_manager")
     def test_get_system_stats_success(self, mock_db_manager):
         """Тест успешного получения статистики системы."""
 
@@ -170,10 +211,9 @@ class TestSystemStats:
         assert stats["failed_requests"] == 1
         assert stats["unique_users"] == 2
 
-    @patch("db.utils.db_manager")
     def test_get_system_stats_error(self, mock_db_manager):
         """Тест получения статистики системы с ошибкой."""
-        mock_db_manager.get_all_request_logs.side_effect = Exception("Database error")
+        mock_db_manager.get_daily_stats.side_effect = Exception("Database error")
 
         stats = get_system_stats()
 
@@ -183,23 +223,21 @@ class TestSystemStats:
 class TestRecentLogs:
     """Тесты для функций недавних логов."""
 
-    @patch("db.utils.db_manager")
-    def test_get_recent_logs_success(self, mock_db_manager):
+    def test_get_recent_logs_success(self, session_mock):
         """Тест успешного получения недавних логов."""
         mock_logs = [
-            Mock(timestamp=datetime(2025, 9, 27, 10, 0), user_id=123, status="success"),
-            Mock(timestamp=datetime(2025, 9, 27, 11, 0), user_id=456, status="error"),
+            RecentRow(_T_10, 123, "success"),
+            RecentRow(_T_11, 456, "error"),
         ]
-        mock_db_manager.get_recent_logs.return_value = mock_logs
+        session_mock.query().order_by().limit().all.return_value = mock_logs
 
         logs = get_recent_logs(limit=50)
 
-        assert len(logs) >= 0  # Может быть пустым из-за реализации to_dict
+        assert logs == [row._asdict() for row in mock_logs]
 
-    @patch("db.utils.db_manager")
     def test_get_recent_logs_error(self, mock_db_manager):
         """Тест получения недавних логов с ошибкой."""
-        mock_db_manager.get_recent_logs.side_effect = Exception("Database error")
+        mock_db_manager.get_session.side_effect = Exception("Database error")
 
         logs = get_recent_logs()
 
@@ -209,17 +247,14 @@ class TestRecentLogs:
 class TestUsersList:
     """Тесты для функций списка пользователей."""
 
-    @patch("db.utils.db_manager")
-    def test_get_users_list_success(self, mock_db_manager):
+    def test_get_users_list_success(self, session_mock):
         """Тест успешного получения списка пользователей."""
-        mock_session = Mock()
         mock_user1 = Mock()
         mock_user1.to_dict.return_value = {"id": 123, "username": "user1"}
         mock_user2 = Mock()
         mock_user2.to_dict.return_value = {"id": 456, "username": "user2"}
 
-        mock_session.query().order_by().limit().all.return_value = [mock_user1, mock_user2]
-        mock_db_manager.get_session.return_value.__enter__.return_value = mock_session
+        session_mock.query().order_by().limit().all.return_value = [mock_user1, mock_user2]
 
         users = get_users_list(limit=100)
 
@@ -227,7 +262,6 @@ class TestUsersList:
         assert users[0]["id"] == 123
         assert users[1]["id"] == 456
 
-    @patch("db.utils.db_manager")
     def test_get_users_list_error(self, mock_db_manager):
         """Тест получения списка пользователей с ошибкой."""
         mock_db_manager.get_session.side_effect = Exception("Database error")
@@ -240,20 +274,14 @@ class TestUsersList:
 class TestDailyLimits:
     """Тесты для функций дневных лимитов."""
 
-    @patch("db.utils.db_manager.get_session")
-    def test_get_user_daily_requests_count_success(self, mock_get_session):
+    def test_get_user_daily_requests_count_success(self, session_mock):
         """Тест успешного получения количества дневных запросов."""
-        mock_session = Mock()
-        mock_query = Mock()
-        mock_query.filter().count.return_value = 5
-        mock_session.query.return_value = mock_query
-        mock_get_session.return_value.__enter__.return_value = mock_session
+        session_mock.query.return_value.filter.return_value.count.return_value = 5
 
         count = get_user_daily_requests_count(123)
 
         assert count == 5
 
-    @patch("db.utils.db_manager")
     def test_get_user_daily_requests_count_error(self, mock_db_manager):
         """Тест получения количества дневных запросов с ошибкой."""
         mock_db_manager.get_session.side_effect = Exception("Database error")
@@ -262,11 +290,10 @@ class TestDailyLimits:
 
         assert count == 0
 
-    @patch.dict("os.environ", {"DAILY_REQUEST_LIMIT": "10"})
-    @patch("db.utils.get_user_daily_requests_count")
-    def test_check_daily_limit_within_limit(self, mock_count):
+    def test_check_daily_limit_within_limit(self, monkeypatch):
         """Тест проверки дневного лимита когда в пределах лимита."""
-        mock_count.return_value = 5
+        monkeypatch.setenv("DAILY_REQUEST_LIMIT", "10")
+        monkeypatch.setattr("db.utils.get_user_daily_requests_count", lambda uid: 5)
 
         result = check_daily_limit(123)
 
@@ -275,11 +302,10 @@ class TestDailyLimits:
         assert result["limit"] == 10
         assert result["remaining"] == 5
 
-    @patch.dict("os.environ", {"DAILY_REQUEST_LIMIT": "10"})
-    @patch("db.utils.get_user_daily_requests_count")
-    def test_check_daily_limit_exceeded(self, mock_count):
+    def test_check_daily_limit_exceeded(self, monkeypatch):
         """Тест проверки дневного лимита когда лимит превышен."""
-        mock_count.return_value = 12
+        monkeypatch.setenv("DAILY_REQUEST_LIMIT", "10")
+        monkeypatch.setattr("db.utils.get_user_daily_requests_count", lambda uid: 12)
 
         result = check_daily_limit(123)
 
@@ -292,76 +318,45 @@ class TestDailyLimits:
 class TestUserStatus:
     """Тесты для функций статуса пользователя."""
 
-    @patch("db.utils.db_manager.get_session")
-    def test_is_user_active_true(self, mock_get_session):
-        """Тест проверки активности пользователя (случай true)."""
-        mock_session = Mock()
-        mock_user = Mock()
-        mock_user.is_active = True
-        mock_session.query().filter().first.return_value = mock_user
-        mock_get_session.return_value.__enter__.return_value = mock_session
+    @pytest.mark.parametrize(
+        "user_state,expected",
+        [(True, True), (False, False), (None, True)],
+        ids=["active", "inactive", "not_exists"],
+    )
+    def test_is_user_active(self, session_mock, user_state, expected):
+        """Тест проверки активности пользователя.
 
-        result = is_user_active(123)
-
-        assert result is True
-
-    @patch("db.utils.db_manager.get_session")
-    def test_is_user_active_false(self, mock_get_session):
-        """Тест проверки активности пользователя (случай false)."""
-        mock_session = Mock()
-        mock_user = Mock()
-        mock_user.is_active = False
-        mock_session.query().filter().first.return_value = mock_user
-        mock_get_session.return_value.__enter__.return_value = mock_session
+        None означает, что пользователь не найден: по логике функции он считается активным.
+        """
+        user = Mock(is_active=user_state) if user_state is not None else None
+        session_mock.query().filter().first.return_value = user
 
         result = is_user_active(123)
 
-        assert result is False
-
-    @patch("db.utils.db_manager.get_session")
-    def test_is_user_active_not_exists(self, mock_get_session):
-        """Тест проверки активности несуществующего пользователя."""
-        mock_session = Mock()
-        mock_session.query().filter().first.return_value = None
-        mock_get_session.return_value.__enter__.return_value = mock_session
-
-        result = is_user_active(999)
-
-        # По логике функции, если пользователь не найден, считается активным
-        assert result is True
+        assert result is expected
 
 
 class TestMessageBlocking:
     """Тесты для функциональности блокировки сообщений."""
 
-    @patch("db.utils.db_manager.get_session")
-    def test_has_sent_blocked_message_true(self, mock_get_session):
+    def test_has_sent_blocked_message_true(self, session_mock):
         """Тест проверки отправки заблокированного сообщения (случай true)."""
-        mock_session = Mock()
-        mock_session.query().filter().count.return_value = 1  # Есть сообщения
-        mock_get_session.return_value.__enter__.return_value = mock_session
+        session_mock.query().filter().count.return_value = 1  # Есть сообщения
 
         result = has_sent_blocked_message(123)
 
         assert result is True
 
-    @patch("db.utils.db_manager.get_session")
-    def test_has_sent_blocked_message_false(self, mock_get_session):
+    def test_has_sent_blocked_message_false(self, session_mock):
         """Тест проверки отправки заблокированного сообщения (случай false)."""
-        mock_session = Mock()
-        mock_session.query().filter().count.return_value = 0  # Нет сообщений
-        mock_get_session.return_value.__enter__.return_value = mock_session
+        session_mock.query().filter().count.return_value = 0  # Нет сообщений
 
         result = has_sent_blocked_message(123)
 
         assert result is False
 
-    @patch("db.utils.db_manager.get_session")
-    def test_log_message_success(self, mock_get_session):
+    def test_log_message_success(self, session_mock):
         """Тест успешного логирования сообщения."""
-        mock_session = Mock()
-        mock_get_session.return_value.__enter__.return_value = mock_session
-
         # Функция log_message требует все эти аргументы
         log_message(
             sender_user_id=123,
@@ -373,24 +368,17 @@ class TestMessageBlocking:
         )
 
         # Проверяем, что сессия была вызвана
-        mock_session.add.assert_called_once()
-        mock_session.commit.assert_called_once()
+        session_mock.add.assert_called_once()
+        session_mock.commit.assert_called_once()
 
 
 class TestDatabaseInfo:
     """Тесты для функций информации о базе данных."""
 
-    @patch("db.utils.db_manager")
-    def test_get_database_info_success(self, mock_db_manager):
+    def test_get_database_info_success(self, mock_db_manager, db_info_session_factory):
         """Тест успешного получения информации о базе данных."""
-        mock_session = Mock()
-        mock_session.query().count.side_effect = [10, 100]  # пользователи, логи
-
-        mock_last_log = Mock()
-        mock_last_log.created_at = datetime(2025, 9, 27, 10, 30)
-        mock_session.query().order_by().first.return_value = mock_last_log
-
-        mock_db_manager.get_session.return_value.__enter__.return_value = mock_session
+        session = db_info_session_factory(10, 100, _T_LAST_LOG)  # пользователи, логи
+        mock_db_manager.get_session.return_value.__enter__.return_value = session
         mock_db_manager.check_connection.return_value = True
 
         info = get_database_info()
@@ -400,7 +388,6 @@ class TestDatabaseInfo:
         assert info["connection_status"] == "active"
         assert "last_log_time" in info
 
-    @patch("db.utils.db_manager")
     def test_get_database_info_error(self, mock_db_manager):
         """Тест получения информации о базе данных с ошибкой."""
         mock_db_manager.get_session.side_effect = Exception("Database error")
@@ -414,18 +401,14 @@ class TestDatabaseInfo:
 class TestCleanupLogs:
     """Тесты для функций очистки логов."""
 
-    @patch("db.utils.db_manager")
-    def test_cleanup_old_logs_success(self, mock_db_manager):
+    def test_cleanup_old_logs_success(self, session_mock):
         """Тест успешной очистки логов."""
-        mock_session = Mock()
-        mock_session.query().filter().delete.return_value = 5
-        mock_db_manager.get_session.return_value.__enter__.return_value = mock_session
+        session_mock.query().filter().delete.return_value = 5
 
         deleted_count = cleanup_old_logs(days=90)
 
         assert deleted_count == 5
 
-    @patch("db.utils.db_manager")
     def test_cleanup_old_logs_error(self, mock_db_manager):
         """Тест очистки логов с ошибкой."""
         mock_db_manager.get_session.side_effect = Exception("Database error")
@@ -438,43 +421,35 @@ class TestCleanupLogs:
 class TestEdgeCases:
     """Тесты для граничных случаев и обработки ошибок."""
 
-    @patch("db.utils.db_manager.get_session")
-    def test_functions_with_none_parameters(self, mock_get_session):
+    def test_functions_with_none_parameters(self, session_mock):
         """Тест функций с параметрами None."""
-        mock_session = Mock()
-        mock_session.query().filter().first.return_value = None
-        mock_session.query().filter().count.return_value = 0
-        mock_get_session.return_value.__enter__.return_value = mock_session
+        session_mock.query().filter().first.return_value = None
+        session_mock.query().filter().count.return_value = 0
 
         # По логике is_user_active, если пользователь не найден (None ID), он считается активным
         assert is_user_active(None) is True
         assert has_sent_blocked_message(None) is False
 
-    def test_environment_variable_integration(self):
+    @pytest.mark.parametrize("env_value,expected_limit", [("10", 10), ("100", 100)], ids=["limit_10", "limit_100"])
+    def test_environment_variable_integration(self, env_value, expected_limit, monkeypatch):
         """Тест интеграции с переменными окружения."""
-        import os
+        monkeypatch.setenv("DAILY_REQUEST_LIMIT", env_value)
+        monkeypatch.setattr("db.utils.get_user_daily_requests_count", lambda _uid: 5)
 
-        # Тест с разными значениями DAILY_REQUEST_LIMIT
-        test_cases = [
-            ("10", 10),
-            ("100", 100),
-        ]
+        result = check_daily_limit(123)
 
-        for env_value, expected_limit in test_cases:
-            with patch.dict(os.environ, {"DAILY_REQUEST_LIMIT": env_value}):
-                with patch("db.utils.get_user_daily_requests_count", return_value=5):
-                    result = check_daily_limit(123)
-                    assert result["limit"] == expected_limit
-                    assert result["current_count"] == 5
-                    assert result["remaining"] == expected_limit - 5
+        assert result["limit"] == expected_limit
+        assert result["current_count"] == 5
+        assert result["remaining"] == expected_limit - 5
 
-    def test_environment_variable_fallback(self):
+    def test_environment_variable_fallback(self, monkeypatch):
         """Тест отката переменной окружения к значению по умолчанию."""
-        import os
-
         # Тест с невалидными значениями, которые должны откатиться к умолчанию
-        with patch.dict(os.environ, {"DAILY_REQUEST_LIMIT": "invalid"}):
-            with patch("db.utils.get_user_daily_requests_count", return_value=5):
-                result = check_daily_limit(123)
-                # Функция должна вернуть None для limit в случае ошибки парсинга
-                assert result is not None  # Функция возвращает словарь с ошибкой
+        monkeypatch.setenv("DAILY_REQUEST_LIMIT", "invalid")
+        monkeypatch.setattr("db.utils.get_user_daily_requests_count", lambda _uid: 5)
+
+        result = check_daily_limit(123)
+
+        # Функция возвращает словарь с ошибкой и разрешает запрос
+        assert result is not None
+        assert result["can_make_request"] is True
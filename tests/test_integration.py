@@ -2,533 +2,489 @@
 Интеграционные тесты для всей системы парсинга фискальных данных - ИСПРАВЛЕННАЯ ВЕРСИЯ
 """
 
+import io
 import logging
-import tempfile
-from datetime import datetime
+import operator
+import os
+from contextlib import ExitStack
+from datetime import datetime, timedelta
 from decimal import Decimal
+from functools import reduce
 
 # Импортируем реальные модули для интеграционного тестирования
 from parser.fiscal_parser import FiscalParser, parse_serbian_fiscal_url
-from pathlib import Path
-from unittest.mock import AsyncMock, Mock, patch
+from types import SimpleNamespace
+from unittest.mock import DEFAULT, Mock, create_autospec, patch
 
 import pytest
 
+import db.utils as db_utils
 from bot_tg.user_commands import handle_message
-from db.utils import init_database, log_user_request
+from db.database import DatabaseManager
+from db.utils import init_database, is_user_active, log_user_request
 from models.fiscal_models import FiscalData, Item, SerbianFiscalData
 from utils.log_manager import LogManager
 
 pytestmark = pytest.mark.integration
 
+# Окружение бота для всего модуля
+BOT_ENV = {"TG_TOKEN": "123456789:ABCDEFGHIJKLMNOPQRSTUVWXYZ", "ADMIN_ID": "123456789", "DAILY_REQUEST_LIMIT": "50"}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _bot_env():
+    """Выставить переменные окружения бота один раз на модуль."""
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in BOT_ENV.items():
+            mp.setenv(name, value)
+        yield
+
+
+@pytest.fixture
+def db_manager_mock(monkeypatch):
+    """Мок db_manager по спецификации DatabaseManager, подставленный в db.utils: БД доступна."""
+    mock = create_autospec(DatabaseManager, instance=True)
+    mock.check_connection.return_value = True
+    mock.init_database.return_value = True
+    monkeypatch.setattr(db_utils, "db_manager", mock)
+    return mock
+
+
+@pytest.fixture(scope="module")
+def large_items():
+    """100 позиций чека по 100.50 для проверки больших наборов данных."""
+    return tuple(
+        {"name": f"Item {i}", "quantity": Decimal("1"), "price": Decimal("100.50"), "sum": Decimal("100.50")}
+        for i in range(100)
+    )
+
+
+@pytest.fixture
+def log_manager_factory(tmp_path):
+    """Фабрика LogManager во временной папке теста: make(retention_days).
+
+    Фоновая очистка при создании менеджера дожидается завершения, чтобы не гоняться с файлами теста.
+    """
+
+    def make(retention_days=30):
+        log_manager = LogManager(log_dir=tmp_path, retention_days=retention_days)
+        log_manager.wait_for_cleanup()
+        return log_manager
+
+    return make
+
+
+@pytest.fixture
+def write_aged_log(tmp_path):
+    """Создать во временной папке вчерашний файл лога (дата в имени и время изменения)."""
+
+    def write(log_type="test"):
+        yesterday = datetime.now() - timedelta(days=1)
+        old_file = tmp_path / f"{log_type}_{yesterday.strftime('%Y-%m-%d')}.log"
+        old_file.write_text("old content")
+        os.utime(old_file, (yesterday.timestamp(), yesterday.timestamp()))
+        return old_file
+
+    return write
+
 
 class TestFullParsingWorkflow:
     """Тест полного рабочего процесса парсинга от URL до JSON."""
 
     @pytest.mark.slow
-    def test_complete_url_to_json_conversion(self, sample_serbian_data, sample_russian_data):
+    def test_complete_url_to_json_conversion(self, serbian_fiscal_model, sample_russian_data, mock_fiscal_parser):
         """Тест полного преобразования от парсинга URL до JSON вывода."""
         test_url = "https://suf.purs.gov.rs/v/?vl=test123"
 
         # Мокируем парсер чтобы вернуть наши образцы данных как объект SerbianFiscalData
-        with patch("parser.fiscal_parser.FiscalParser") as mock_parser_class:
-            mock_parser = Mock()
-            mock_parser_class.return_value.__enter__.return_value = mock_parser
-            # Создаем объект SerbianFiscalData из образца данных
-            serbian_fiscal_data = SerbianFiscalData(**sample_serbian_data)
-            mock_parser.parse_url.return_value = serbian_fiscal_data
-
-            # Мокируем конвертер чтобы вернуть полные российские данные
-            mock_converter = Mock()
-            mock_converted_data = FiscalData(**sample_russian_data)
-            mock_converter.convert.return_value = mock_converted_data
-
-            with patch("parser.fiscal_parser.SerbianToRussianConverter", return_value=mock_converter):
-                result = parse_serbian_fiscal_url(test_url, headless=True)
-
-                assert result is not None
-                assert isinstance(result, list)
-                assert len(result) > 0
-
-                # Проверяем структуру
-                json_data = result[0]
-                assert "_id" in json_data
-                assert "ticket" in json_data
-                assert json_data["_id"] == "66ce2f2a5b87f45c8a123456"  # Из sample_russian_data
+        mock_fiscal_parser.parse_url.return_value = serbian_fiscal_model
 
-    @pytest.mark.slow
-    def test_parser_with_invalid_url(self):
-        """Тест parser behavior with invalid URL."""
-        invalid_url = "https://invalid-url.com/not-fiscal"
+        # Мокируем конвертер чтобы вернуть полные российские данные
+        mock_converter = Mock()
+        mock_converted_data = FiscalData(**sample_russian_data)
+        mock_converter.convert.return_value = mock_converted_data
+
+        with patch("parser.fiscal_parser.SerbianToRussianConverter", return_value=mock_converter):
+            result = parse_serbian_fiscal_url(test_url, headless=True)
 
-        # Это должно обрабатываться корректно
-        with patch("parser.fiscal_parser.FiscalParser") as mock_parser_class:
-            mock_parser = Mock()
-            mock_parser_class.return_value.__enter__.return_value = mock_parser
-            mock_parser.parse_url.side_effect = Exception("Invalid URL")
+            assert result is not None
+            assert isinstance(result, list)
+            assert len(result) > 0
 
-            with pytest.raises(Exception):
-                parse_serbian_fiscal_url(invalid_url)
+            # Проверяем структуру
+            json_data = result[0]
+            assert "_id" in json_data
+            assert "ticket" in json_data
+            assert json_data["_id"] == "66ce2f2a5b87f45c8a123456"  # Из sample_russian_data
 
     @pytest.mark.slow
-    def test_end_to_end_data_flow(self, sample_serbian_data):
+    def test_end_to_end_data_flow(self):
         """Тест end-to-end data flow from parsing to database logging."""
         test_url = "https://suf.purs.gov.rs/v/?vl=test123"
         user_id = 123456
+        mock_result = [{"_id": "test123", "ticket": {"document": {"receipt": {"totalSum": 18396}}}}]
 
-        # Мокируем все внешние зависимости
-        with patch("parser.fiscal_parser.parse_serbian_fiscal_url") as mock_parse:
-            mock_result = [{"_id": "test123", "ticket": {"document": {"receipt": {"totalSum": 18396}}}}]
-            mock_parse.return_value = mock_result
+        # Мокируем внешние зависимости там, где они связаны импортом в этом модуле
+        with patch.multiple(__name__, parse_serbian_fiscal_url=DEFAULT, log_user_request=DEFAULT) as mocks:
+            mocks["parse_serbian_fiscal_url"].return_value = mock_result
+            mocks["log_user_request"].return_value = True
 
-            with patch("db.utils.log_user_request") as mock_log:
-                mock_log.return_value = True
+            # Симулируем полный рабочий процесс
+            result = parse_serbian_fiscal_url(test_url)
+            logged = log_user_request(user_id, status="success")
 
-                # Импортируем функцию внутри контекста патча чтобы использовать мокированную версию
-                from parser.fiscal_parser import parse_serbian_fiscal_url
-
-                from db.utils import log_user_request
-
-                # Симулируем полный рабочий процесс
-                result = parse_serbian_fiscal_url(test_url)
-                logged = log_user_request(user_id, status="success")
-
-                assert result == mock_result
-                assert logged is True
-                mock_parse.assert_called_once_with(test_url)
-                mock_log.assert_called_once()
+        assert result == mock_result
+        assert logged is True
+        mocks["parse_serbian_fiscal_url"].assert_called_once_with(test_url)
+        mocks["log_user_request"].assert_called_once()
 
 
 class TestSeleniumIntegration:
     """Тест Selenium WebDriver integration."""
 
+    @pytest.fixture
+    def chrome_driver_patches(self):
+        """Подменить Chrome, Service и ChromeDriverManager там, где их использует парсер.
+
+        ChromeDriverManager и Service импортированы в parser.fiscal_parser напрямую, поэтому
+        патчить их нужно в этом модуле: иначе install() ходит в сеть за драйвером.
+        """
+        with ExitStack() as stack:
+            chrome = stack.enter_context(patch("selenium.webdriver.Chrome"))
+            driver_manager = stack.enter_context(patch("parser.fiscal_parser.ChromeDriverManager"))
+            service = stack.enter_context(patch("parser.fiscal_parser.Service"))
+            driver_manager.return_value.install.return_value = "/path/to/chromedriver"
+            yield SimpleNamespace(chrome=chrome, driver_manager=driver_manager, service=service)
+
+    @pytest.mark.slow
     @pytest.mark.selenium
-    def test_fiscal_parser_driver_setup(self):
+    def test_fiscal_parser_driver_setup(self, chrome_driver_patches):
         """Тест FiscalParser WebDriver setup."""
-        with patch("selenium.webdriver.Chrome") as mock_chrome:
-            with patch("webdriver_manager.chrome.ChromeDriverManager") as mock_cdm:
-                mock_cdm.return_value.install.return_value = "/path/to/chromedriver"
-                mock_driver = Mock()
-                mock_chrome.return_value = mock_driver
-
-                parser = FiscalParser(headless=True)
+        parser = FiscalParser(headless=True)
 
-                # Проверяем что драйвер был настроен
-                assert parser is not None
-                mock_chrome.assert_called_once()
+        # Проверяем что драйвер был настроен
+        assert parser.driver is chrome_driver_patches.chrome.return_value
+        chrome_driver_patches.chrome.assert_called_once()
 
+    @pytest.mark.slow
     @pytest.mark.selenium
-    def test_fiscal_parser_page_parsing(self):
+    def test_fiscal_parser_page_parsing(self, chrome_driver_patches, monkeypatch, tmp_path):
         """Тест FiscalParser page parsing logic."""
-        mock_driver = Mock()
-
-        with patch("selenium.webdriver.Chrome", return_value=mock_driver):
-            with patch("webdriver_manager.chrome.ChromeDriverManager") as mock_cdm:
-                mock_cdm.return_value.install.return_value = "/path/to/chromedriver"
-
-                parser = FiscalParser(headless=True)
-
-                # Мокируем исходный код страницы с минимальным валидным HTML
-                test_html = """
-                <html>
-                    <body>
-                        <div>Test content</div>
-                    </body>
-                </html>
-                """
-                mock_driver.page_source = test_html
-
-                # Тестируем что парсер может обработать HTML контент без сбоев
-                try:
-                    result = parser._parse_html_content(test_html)
-                    # Должен вернуть объект SerbianFiscalData даже с пустыми/минимальными данными
-                    assert result is not None
-                    assert hasattr(result, "tin")
-                    assert hasattr(result, "shop_name")
-                    assert hasattr(result, "items")
-                except Exception as e:
-                    # Если парсинг не удается, это тоже приемлемо для этого интеграционного теста
-                    # Важно что метод существует и может быть вызван
-                    assert "parse_html_content" not in str(e)  # Method should exist
+        # Отладочный HTML парсер сохраняет в папку логов: направляем его во временную папку
+        monkeypatch.setattr("parser.fiscal_parser.log_manager.log_dir", tmp_path)
+        parser = FiscalParser(headless=True)
+
+        # Мокируем исходный код страницы с минимальным валидным HTML
+        test_html = """
+        <html>
+            <body>
+                <div>Test content</div>
+            </body>
+        </html>
+        """
+        parser.driver.page_source = test_html
+
+        # Тестируем что парсер может обработать HTML контент без сбоев
+        try:
+            result = parser._parse_html_content(test_html)
+            # Должен вернуть объект SerbianFiscalData даже с пустыми/минимальными данными
+            assert result is not None
+            assert hasattr(result, "tin")
+            assert hasattr(result, "shop_name")
+            assert hasattr(result, "items")
+        except Exception as e:
+            # Если парсинг не удается, это тоже приемлемо для этого интеграционного теста
+            # Важно что метод существует и может быть вызван
+            assert "parse_html_content" not in str(e)  # Method should exist
 
 
 class TestDatabaseIntegration:
     """Тест database integration."""
 
     @pytest.mark.database
-    def test_database_initialization(self):
+    def test_database_initialization(self, db_manager_mock):
         """Тест database initialization."""
-        with patch("db.utils.db_manager") as mock_db_manager:
-            mock_db_manager.check_connection.return_value = True
-            mock_db_manager.init_database.return_value = True
-
-            result = init_database()
+        result = init_database()
 
-            assert result is True
-            mock_db_manager.check_connection.assert_called_once()
-            mock_db_manager.init_database.assert_called_once()
+        assert result is True
+        db_manager_mock.check_connection.assert_called_once()
+        db_manager_mock.init_database.assert_called_once()
 
     @pytest.mark.database
-    def test_request_logging_integration(self):
+    def test_request_logging_integration(self, db_manager_mock):
         """Тест request logging integration."""
         user_id = 123456
-        test_url = "https://suf.purs.gov.rs/v/?vl=test123"
-
-        with patch("db.utils.db_manager") as mock_db_manager:
-            mock_db_manager.add_request_log.return_value = Mock()  # Возвращаем мок объект лога
 
-            result = log_user_request(user_id, status="success")
+        result = log_user_request(user_id, status="success")
 
-            assert result is True
-            mock_db_manager.add_request_log.assert_called_once_with(
-                user_id=user_id, username=None, status="success", error_message=None
-            )
+        assert result is True
+        db_manager_mock.add_request_log.assert_called_once_with(
+            user_id=user_id, username=None, status="success", error_message=None
+        )
 
     @pytest.mark.database
-    def test_user_management_integration(self):
+    def test_user_management_integration(self, db_manager_mock):
         """Тест user management integration."""
         user_id = 123456
 
-        with patch("db.utils.db_manager") as mock_db_manager:
-            mock_session = Mock()
-            mock_user = Mock()
-            mock_user.is_active = True
-            mock_session.query.return_value.filter.return_value.first.return_value = mock_user
-            mock_db_manager.get_session.return_value.__enter__.return_value = mock_session
+        mock_session = Mock()
+        mock_session.query.return_value.filter.return_value.first.return_value = Mock(is_active=True)
+        db_manager_mock.get_session.return_value.__enter__.return_value = mock_session
 
-            from db.utils import is_user_active
+        result = is_user_active(user_id)
 
-            result = is_user_active(user_id)
-
-            assert result is True
+        assert result is True
 
 
+@pytest.mark.asyncio(loop_scope="module")
 class TestBotIntegration:
     """Тест bot integration with parsing and database."""
 
-    @pytest.mark.asyncio
-    async def test_bot_message_handling_integration(self):
+    @pytest.fixture
+    def user_commands_mocks(self, mock_telegram_update):
+        """Зависимости bot_tg.user_commands одним patch.multiple: активный пользователь в пределах лимита."""
+        mock_telegram_update.effective_user.id = 123456
+        mock_telegram_update.message.text = "https://suf.purs.gov.rs/v/?vl=test123"
+
+        with patch.multiple(
+            "bot_tg.user_commands",
+            is_user_active=DEFAULT,
+            check_daily_limit=DEFAULT,
+            parse_serbian_fiscal_url=DEFAULT,
+            log_user_request=DEFAULT,
+        ) as mocks:
+            mocks["is_user_active"].return_value = True
+            mocks["check_daily_limit"].return_value = {
+                "can_make_request": True,
+                "current_count": 5,
+                "limit": 50,
+                "remaining": 45,
+            }
+            mocks["log_user_request"].return_value = True
+            yield mocks
+
+    async def test_bot_message_handling_integration(
+        self, user_commands_mocks, mock_telegram_update, mock_telegram_context
+    ):
         """Тест bot message handling integration."""
-        # Сначала мокируем переменные окружения
-        with patch.dict(
-            "os.environ",
-            {"TG_TOKEN": "123456789:ABCDEFGHIJKLMNOPQRSTUVWXYZ", "ADMIN_ID": "123456789", "DAILY_REQUEST_LIMIT": "50"},
-        ):
-            mock_update = Mock()
-            mock_context = Mock()
-
-            # Настраиваем мок update
-            mock_update.effective_user.id = 123456
-            mock_update.effective_user.username = "test_user"
-            mock_update.message.text = "https://suf.purs.gov.rs/v/?vl=test123"
-            mock_update.message.reply_text = AsyncMock()
-            mock_update.message.reply_document = AsyncMock()
-
-            # Мокируем все зависимости
-            with patch("bot_tg.user_commands.is_user_active", return_value=True):
-                with patch("bot_tg.user_commands.check_daily_limit") as mock_limit:
-                    mock_limit.return_value = {
-                        "can_make_request": True,
-                        "current_count": 5,
-                        "limit": 50,
-                        "remaining": 45,
-                    }
-
-                    with patch("bot_tg.user_commands.parse_serbian_fiscal_url") as mock_parse:
-                        mock_result = [{"_id": "test123", "ticket": {"document": {"receipt": {"totalSum": 18396}}}}]
-                        mock_parse.return_value = mock_result
-
-                        with patch("bot_tg.user_commands.log_user_request", return_value=True):
-                            await handle_message(mock_update, mock_context)
-
-                            # Должен был вызвать парсер
-                            mock_parse.assert_called_once()
-
-                            # Должен был отправить ответ
-                            assert mock_update.message.reply_document.called or mock_update.message.reply_text.called
-
-    @pytest.mark.asyncio
-    async def test_bot_error_handling_integration(self):
+        mock_parse = user_commands_mocks["parse_serbian_fiscal_url"]
+        mock_parse.return_value = [{"_id": "test123", "ticket": {"document": {"receipt": {"totalSum": 18396}}}}]
+
+        await handle_message(mock_telegram_update, mock_telegram_context)
+
+        # Должен был вызвать парсер
+        mock_parse.assert_called_once()
+
+        # Должен был отправить ответ
+        assert mock_telegram_update.message.reply_document.called or mock_telegram_update.message.reply_text.called
+
+    async def test_bot_error_handling_integration(
+        self, user_commands_mocks, mock_telegram_update, mock_telegram_context
+    ):
         """Тест bot error handling integration."""
-        # Сначала мокируем переменные окружения
-        with patch.dict(
-            "os.environ",
-            {"TG_TOKEN": "123456789:ABCDEFGHIJKLMNOPQRSTUVWXYZ", "ADMIN_ID": "123456789", "DAILY_REQUEST_LIMIT": "50"},
-        ):
-            mock_update = Mock()
-            mock_context = Mock()
-
-            # Настраиваем мок update
-            mock_update.effective_user.id = 123456
-            mock_update.message.text = "https://suf.purs.gov.rs/v/?vl=test123"
-            mock_update.message.reply_text = AsyncMock()
-
-            # Мокируем пользователя как активного но парсер не работает
-            with patch("bot_tg.user_commands.is_user_active", return_value=True):
-                with patch("bot_tg.user_commands.check_daily_limit") as mock_limit:
-                    mock_limit.return_value = {
-                        "can_make_request": True,
-                        "current_count": 5,
-                        "limit": 50,
-                        "remaining": 45,
-                    }
-
-                    with patch("bot_tg.user_commands.parse_serbian_fiscal_url", side_effect=Exception("Parser error")):
-                        with patch("bot_tg.user_commands.log_user_request", return_value=True):
-                            await handle_message(mock_update, mock_context)
-
-                            # Должен был корректно обработать ошибку
-                            mock_update.message.reply_text.assert_called()
-                            # Проверяем что хотя бы сообщение об обработке было отправлено
-                            call_args_list = [call[0][0] for call in mock_update.message.reply_text.call_args_list]
-                            assert len(call_args_list) > 0, "Expected at least one message to be sent"
-                            # Ошибка должна быть залогирована (мы можем увидеть это в stderr)
-                            assert (
-                                "обрабатываю" in call_args_list[0].lower()
-                            ), f"Expected processing message, got: {call_args_list}"
+        # Пользователь активен, но парсер не работает
+        user_commands_mocks["parse_serbian_fiscal_url"].side_effect = Exception("Parser error")
+
+        await handle_message(mock_telegram_update, mock_telegram_context)
+
+        # Должен был корректно обработать ошибку
+        mock_telegram_update.message.reply_text.assert_called()
+        # Проверяем что хотя бы сообщение об обработке было отправлено
+        call_args_list = [call[0][0] for call in mock_telegram_update.message.reply_text.call_args_list]
+        assert len(call_args_list) > 0, "Expected at least one message to be sent"
+        # Ошибка должна быть залогирована (мы можем увидеть это в stderr)
+        assert "обрабатываю" in call_args_list[0].lower(), f"Expected processing message, got: {call_args_list}"
 
 
 class TestLoggingIntegration:
     """Тест logging system integration."""
 
-    def test_log_manager_integration(self):
+    def test_log_manager_integration(self, log_manager_factory, monkeypatch):
         """Тест log manager integration across the system."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            log_dir = Path(temp_dir)
-            log_manager = LogManager(log_dir=log_dir, retention_days=30)
-
-            # Тестируем настройку разных типов логгеров
-            bot_logger = log_manager.setup_logging("bot", logging.INFO)
-            parser_logger = log_manager.setup_logging("parser", logging.DEBUG)
-
-            assert bot_logger.name == "bot"
-            assert parser_logger.name == "parser"
-
-            # Тестируем логирование в оба
-            bot_logger.info("Bot message")
-            parser_logger.debug("Parser debug message")
-
-            # Закрываем все обработчики чтобы освободить блокировки файлов
-            for handler in bot_logger.handlers[:]:
-                handler.close()
-                bot_logger.removeHandler(handler)
-            for handler in parser_logger.handlers[:]:
-                handler.close()
-                parser_logger.removeHandler(handler)
-
-            # Получаем статистику
-            stats = log_manager.get_log_stats()
-            assert stats is not None
-            assert isinstance(stats, dict)
-
-    def test_daily_log_rotation_integration(self):
-        """Тест daily log rotation integration."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            log_dir = Path(temp_dir)
-            # Используем очень короткий период хранения (0 дней) чтобы убедиться что очистка работает
-            log_manager = LogManager(log_dir=log_dir, retention_days=0)
-
-            # Create logs for different days
-            from datetime import timedelta
+        # Файлы логов здесь не проверяются: пишем в память вместо диска
+        monkeypatch.setattr(
+            "utils.log_manager.DailyLogFileHandler", lambda *args, **kwargs: logging.StreamHandler(io.StringIO())
+        )
+        log_manager = log_manager_factory(retention_days=30)
 
-            today = datetime.now()
-            yesterday = today - timedelta(days=1)
+        # Тестируем настройку разных типов логгеров
+        bot_logger = log_manager.setup_logging("bot", logging.INFO)
+        parser_logger = log_manager.setup_logging("parser", logging.DEBUG)
 
-            # Get log file paths for different days
-            today_file = log_manager.get_daily_log_file("test")
+        assert bot_logger.name == "bot"
+        assert parser_logger.name == "parser"
 
-            # Should include date in filename
-            today_str = today.strftime("%Y-%m-%d")
-            assert today_str in today_file.name
+        # Тестируем логирование в оба
+        bot_logger.info("Bot message")
+        parser_logger.debug("Parser debug message")
 
-            # Test cleanup functionality - create a file that will be considered old
-            old_date = (today - timedelta(days=1)).strftime("%Y-%m-%d")
-            old_file = log_dir / f"test_{old_date}.log"
-            old_file.write_text("old content")
+        # Отцепляем обработчики от общих логгеров и останавливаем их фоновые потоки
+        log_manager.close()
 
-            # Wait a moment to ensure file creation time is in the past
-            import time
+        # Получаем статистику
+        stats = log_manager.get_log_stats()
+        assert stats is not None
+        assert isinstance(stats, dict)
 
-            time.sleep(0.1)
+    def test_daily_log_rotation_integration(self, log_manager_factory, write_aged_log):
+        """Тест daily log rotation integration."""
+        # Используем очень короткий период хранения (0 дней) чтобы убедиться что очистка работает
+        log_manager = log_manager_factory(retention_days=0)
 
-            # Run cleanup (retention_days=0 means any file older than today should be deleted)
-            deleted_count = log_manager.cleanup_old_logs()
+        # Get log file path for today
+        today_file = log_manager.get_daily_log_file("test")
 
-            # Old file should be removed (since retention_days=0)
-            assert deleted_count >= 1
-            assert not old_file.exists()
+        # Should include date in filename
+        assert datetime.now().strftime("%Y-%m-%d") in today_file.name
 
+        # Test cleanup functionality - create a file that will be considered old
+        old_file = write_aged_log("test")
 
-class TestModelValidationIntegration:
-    """Тест model validation integration."""
+        # Run cleanup (retention_days=0 means any file older than today should be deleted)
+        deleted_count = log_manager.cleanup_old_logs()
 
-    def test_serbian_to_russian_model_conversion(self, sample_serbian_data):
-        """Тест Serbian to Russian model conversion."""
-        # Create Serbian data using fixture
-        serbian_data = SerbianFiscalData(**sample_serbian_data)
+        # Old file should be removed (since retention_days=0)
+        assert deleted_count >= 1
+        assert not old_file.exists()
 
-        # Should validate successfully
-        assert serbian_data.tin == sample_serbian_data["tin"]
-        assert len(serbian_data.items) == len(sample_serbian_data["items"])
-        assert serbian_data.total_amount == sample_serbian_data["total_amount"]
 
-    def test_russian_model_creation(self, sample_russian_data):
-        """Тест Russian model creation."""
-        # Create Russian data using fixture
-        russian_data = FiscalData(**sample_russian_data)
+class TestModelValidationIntegration:
+    """Тест model validation integration."""
 
-        # Should validate successfully
-        assert russian_data.id == sample_russian_data["_id"]  # Field is 'id' but alias is '_id'
-        assert (
-            russian_data.ticket.document.receipt.totalSum
-            == sample_russian_data["ticket"]["document"]["receipt"]["totalSum"]
+    @pytest.mark.parametrize(
+        "model_cls,data_fixture,attr_path,key_path,measure",
+        [
+            (SerbianFiscalData, "sample_serbian_data", "tin", ("tin",), None),
+            (SerbianFiscalData, "sample_serbian_data", "items", ("items",), len),
+            (SerbianFiscalData, "sample_serbian_data", "total_amount", ("total_amount",), None),
+            # Поле называется id, а в данных используется алиас _id
+            (FiscalData, "sample_russian_data", "id", ("_id",), None),
+            (
+                FiscalData,
+                "sample_russian_data",
+                "ticket.document.receipt.totalSum",
+                ("ticket", "document", "receipt", "totalSum"),
+                None,
+            ),
+        ],
+        ids=["serbian_tin", "serbian_items", "serbian_total", "russian_id", "russian_total_sum"],
+    )
+    def test_model_field_matches_source(self, request, model_cls, data_fixture, attr_path, key_path, measure):
+        """Тест создания модели из образца данных: поле модели совпадает с исходным значением."""
+        data = request.getfixturevalue(data_fixture)
+
+        model = model_cls(**data)
+
+        expected = reduce(operator.getitem, key_path, data)
+        actual = operator.attrgetter(attr_path)(model)
+        if measure is not None:
+            actual, expected = measure(actual), measure(expected)
+        assert actual == expected
+
+    @pytest.mark.parametrize("amount", [0, 999999999], ids=["zero", "large"])
+    def test_model_edge_cases(self, amount):
+        """Тест model validation with edge cases: нулевые и очень большие суммы."""
+        item = Item(
+            name="Edge Item", quantity=Decimal("1"), price=amount, sum=amount, nds=2, paymentType=4, productType=1
         )
 
-    def test_model_edge_cases(self):
-        """Тест model validation with edge cases."""
-        # Test with zero amounts
-        item_data = Item(name="Free Item", quantity=Decimal("1"), price=0, sum=0, nds=2, paymentType=4, productType=1)
-
         # Should validate successfully
-        assert item_data.price == 0
-        assert item_data.sum == 0
-
-        # Test with large amounts
-        large_item = Item(
-            name="Expensive Item",
-            quantity=Decimal("1"),
-            price=999999999,  # Very large amount
-            sum=999999999,
-            nds=2,
-            paymentType=4,
-            productType=1,
-        )
-
-        # Should validate successfully
-        assert large_item.price == 999999999
+        assert item.price == amount
+        assert item.sum == amount
 
 
 class TestErrorHandlingIntegration:
     """Тест error handling across the integrated system."""
 
     @pytest.mark.slow
-    def test_parsing_error_propagation(self):
-        """Тест how parsing errors propagate through the system."""
-        test_url = "https://suf.purs.gov.rs/v/?vl=invalid"
-
-        with patch("parser.fiscal_parser.FiscalParser") as mock_parser_class:
-            mock_parser = Mock()
-            mock_parser_class.return_value.__enter__.return_value = mock_parser
-            mock_parser.parse_url.side_effect = Exception("Network error")
-
-            # Should propagate the exception
-            with pytest.raises(Exception, match="Network error"):
-                parse_serbian_fiscal_url(test_url)
-
-    def test_database_error_handling(self):
+    @pytest.mark.parametrize(
+        "exc,url",
+        [
+            (ValueError("Invalid URL"), "https://invalid-url.com/not-fiscal"),
+            (ConnectionError("Network error"), "https://suf.purs.gov.rs/v/?vl=invalid"),
+        ],
+        ids=["invalid_url", "network_error"],
+    )
+    def test_parsing_error_propagation(self, mock_fiscal_parser, exc, url):
+        """Тест проброса ошибок парсера через parse_serbian_fiscal_url."""
+        mock_fiscal_parser.parse_url.side_effect = exc
+
+        # Should propagate the exception
+        with pytest.raises(type(exc), match=str(exc)):
+            parse_serbian_fiscal_url(url)
+
+    def test_database_error_handling(self, db_manager_mock):
         """Тест database error handling integration."""
-        with patch("db.utils.db_manager") as mock_db_manager:
-            mock_db_manager.check_connection.side_effect = Exception("Database connection failed")
+        db_manager_mock.check_connection.side_effect = Exception("Database connection failed")
 
-            result = init_database()
+        result = init_database()
 
-            # Should handle error gracefully
-            assert result is False
+        # Should handle error gracefully
+        assert result is False
 
-    def test_logging_error_resilience(self):
+    def test_logging_error_resilience(self, log_manager_factory):
         """Тест logging system error resilience."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            log_dir = Path(temp_dir)
-            log_manager = LogManager(log_dir=log_dir)
+        log_manager = log_manager_factory()
 
-            # Test with permission error
-            with patch("logging.FileHandler", side_effect=PermissionError("No permission")):
-                logger = log_manager.setup_logging("error_test", logging.INFO)
+        # Test with permission error
+        with patch("utils.log_manager.DailyLogFileHandler", side_effect=PermissionError("No permission")):
+            logger = log_manager.setup_logging("error_test", logging.INFO)
 
-                # Should still create a logger (console-only)
-                assert logger is not None
-                assert logger.name == "error_test"
+            # Should still create a logger (console-only)
+            assert logger is not None
+            assert logger.name == "error_test"
 
 
 class TestPerformanceIntegration:
     """Тест performance-related integration scenarios."""
 
     @pytest.mark.slow
-    def test_concurrent_parsing_simulation(self):
-        """Тест simulation of concurrent parsing requests."""
-        test_urls = [f"https://suf.purs.gov.rs/v/?vl=test{i}" for i in range(3)]
-
-        results = []
-
-        with patch("parser.fiscal_parser.FiscalParser") as mock_parser_class:
-            mock_parser = Mock()
-            mock_parser_class.return_value.__enter__.return_value = mock_parser
-
-            def mock_parse_url(url):
-                # Simulate different results for different URLs
-                url_id = url.split("test")[-1]
-                return {
-                    "tin": f"123456{url_id}",
-                    "shop_name": f"Shop {url_id}",
-                    "items": [{"name": f"Item {url_id}", "price": Decimal("100")}],
-                }
-
-            mock_parser.parse_url.side_effect = mock_parse_url
-
-            # Mock converter
-            with patch("parser.fiscal_parser.SerbianToRussianConverter") as mock_converter_class:
-                mock_converter = Mock()
-                mock_converter_class.return_value = mock_converter
-
-                def mock_convert():
-                    return FiscalData(_id="test123", ticket={"document": {"receipt": {"totalSum": 10000}}})
+    @pytest.mark.parametrize("url_id", [0, 1, 2])
+    def test_concurrent_parsing_simulation(self, url_id, mock_fiscal_parser, sample_russian_data):
+        """Тест независимых запросов парсинга: по одному URL на элемент теста."""
+        url = f"https://suf.purs.gov.rs/v/?vl=test{url_id}"
+
+        # Разные результаты для разных URL
+        serbian_data = SimpleNamespace(
+            tin=f"123456{url_id}",
+            shop_name=f"Shop {url_id}",
+            total_amount=Decimal("100"),
+            items=[{"name": f"Item {url_id}", "price": Decimal("100")}],
+        )
+        mock_fiscal_parser.parse_url.return_value = serbian_data
 
-                mock_converter.convert.side_effect = mock_convert
+        with patch("parser.fiscal_parser.SerbianToRussianConverter") as mock_converter_class:
+            mock_converter_class.return_value.convert.return_value = FiscalData(
+                **{**sample_russian_data, "_id": f"test{url_id}"}
+            )
 
-                # Process multiple URLs
-                for url in test_urls:
-                    try:
-                        result = parse_serbian_fiscal_url(url)
-                        results.append(result)
-                    except Exception as e:
-                        results.append(None)
+            result = parse_serbian_fiscal_url(url)
 
-        # Should handle multiple requests
-        assert len(results) == len(test_urls)
+        mock_fiscal_parser.parse_url.assert_called_once_with(url)
+        mock_converter_class.assert_called_once_with(serbian_data)
+        assert result[0]["_id"] == f"test{url_id}"
 
-    def test_large_dataset_handling(self, sample_serbian_data):
+    def test_large_dataset_handling(self, sample_serbian_data, large_items):
         """Тест handling of large datasets."""
-        # Create a large Serbian data structure using fixture as base
-        large_items = []
-        for i in range(100):  # 100 items
-            item_data = {
-                "name": f"Item {i}",
-                "quantity": Decimal("1"),
-                "price": Decimal("100.50"),
-                "sum": Decimal("100.50"),
-            }
-            large_items.append(item_data)
+        # Use sample_serbian_data as base and replace items and total
+        large_data = {**sample_serbian_data, "items": list(large_items), "total_amount": Decimal("10050.00")}
 
-        # Use sample_serbian_data as base and modify items and total
-        large_data = sample_serbian_data.copy()
-        large_data["items"] = large_items
-        large_data["total_amount"] = Decimal("10050.00")  # 100 * 100.50
-
-        serbian_data = SerbianFiscalData(**large_data)
+        serbian_data = SerbianFiscalData.model_validate(large_data)
 
         # Should handle large dataset
         assert len(serbian_data.items) == 100
-        assert serbian_data.total_amount == Decimal("10050.00")
+        assert serbian_data.total_amount == Decimal("10050.00")  # 100 * 100.50
 
 
 class TestConfigurationIntegration:
     """Тест configuration integration across the system."""
 
-    @patch.dict("os.environ", {"DAILY_REQUEST_LIMIT": "25"})
-    def test_environment_variable_integration(self):
+    def test_environment_variable_integration(self, monkeypatch):
         """Тест environment variable integration."""
         from db.utils import check_daily_limit
 
+        monkeypatch.setenv("DAILY_REQUEST_LIMIT", "25")
+
         with patch("db.utils.get_user_daily_requests_count", return_value=10):
             result = check_daily_limit(123)
 
@@ -536,29 +492,21 @@ class TestConfigurationIntegration:
             assert result["current_count"] == 10
             assert result["remaining"] == 15
 
-    @patch.dict("os.environ", {"LOG_RETENTION_DAYS": "14"})
-    def test_log_retention_configuration(self):
+    def test_log_retention_configuration(self, monkeypatch, log_manager_factory):
         """Тест log retention configuration integration."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            log_dir = Path(temp_dir)
+        monkeypatch.setenv("LOG_RETENTION_DAYS", "14")
 
-            # LogManager should use explicit parameter, not environment
-            log_manager = LogManager(log_dir=log_dir, retention_days=7)
+        # LogManager should use explicit parameter, not environment
+        log_manager = log_manager_factory(retention_days=7)
 
-            assert log_manager.retention_days == 7  # Explicit parameter wins
+        assert log_manager.retention_days == 7  # Explicit parameter wins
 
-    def test_admin_id_configuration(self):
+    def test_admin_id_configuration(self, monkeypatch):
         """Тест admin ID configuration integration."""
+        import bot_tg.admin_commands as admin_commands
 
-        with patch.dict("os.environ", {"ADMIN_ID": "987654321"}):
-            # Import after setting environment variable
-            import importlib
-
-            import bot_tg.admin_commands
-
-            importlib.reload(bot_tg.admin_commands)
+        # admin_id читается из окружения при импорте, поэтому подменяем уже вычисленное значение
+        monkeypatch.setattr(admin_commands, "admin_id", 987654321)
 
-            # Should use the environment variable
-            # Note: This test might not work as expected due to module loading order
-            # In real scenarios, environment variables should be set before import
-            pass  # Placeholder for this complex test
+        assert admin_commands.is_admin(987654321) is True
+        assert admin_commands.is_admin(123456789) is False
@@ -2,15 +2,27 @@
 Тесты для менеджера логов в utils/log_manager.py - ИСПРАВЛЕННАЯ ВЕРСИЯ
 """
 
+import errno
+import io
 import logging
+import os
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 from unittest.mock import patch
 
 import pytest
 
-from utils.log_manager import LogManager, get_log_manager
+from utils.log_manager import (
+    BufferedLogHandler,
+    DailyLogFileHandler,
+    LogManager,
+    _probe_dir_writable,
+    get_log_manager,
+    reset_log_manager,
+)
 
 
 class TestLogManager:
@@ -30,34 +42,42 @@ class TestLogManager:
 
         assert log_manager.retention_days == 30  # Значение по умолчанию
 
-    def test_get_daily_log_file(self, temp_log_dir):
+    def test_get_daily_log_file(self, shared_log_manager):
         """Тест получения пути к ежедневному файлу логов."""
-        log_manager = LogManager(log_dir=temp_log_dir)
-
-        log_file = log_manager.get_daily_log_file("test")
+        log_file = shared_log_manager.get_daily_log_file("test")
 
         today = datetime.now().strftime("%Y-%m-%d")
         expected_filename = f"test_{today}.log"
 
         assert log_file.name == expected_filename
-        assert log_file.parent == temp_log_dir
+        assert log_file.parent == shared_log_manager.log_dir
 
-    def test_get_daily_log_file_different_types(self, temp_log_dir):
-        """Тест получения ежедневных файлов логов для разных типов."""
+    def test_get_daily_log_file_date_cache(self, temp_log_dir):
+        """Тест того, что дата кэшируется до полуночи и пересчитывается после нее."""
         log_manager = LogManager(log_dir=temp_log_dir)
+        log_manager._cached_date_str = "2000-01-01"
+        log_manager._date_valid_until = time.time() + 60
+
+        assert log_manager.get_daily_log_file("test").name == "test_2000-01-01.log"
+        assert log_manager.get_daily_log_file("test") is log_manager.get_daily_log_file("test")
+
+        # Полночь прошла - дата должна пересчитаться
+        log_manager._date_valid_until = 0.0
+        today = datetime.now().strftime("%Y-%m-%d")
+        assert log_manager.get_daily_log_file("test").name == f"test_{today}.log"
 
-        bot_file = log_manager.get_daily_log_file("bot")
-        parser_file = log_manager.get_daily_log_file("parser")
+    def test_get_daily_log_file_different_types(self, shared_log_manager):
+        """Тест получения ежедневных файлов логов для разных типов."""
+        bot_file = shared_log_manager.get_daily_log_file("bot")
+        parser_file = shared_log_manager.get_daily_log_file("parser")
 
         assert "bot_" in bot_file.name
         assert "parser_" in parser_file.name
         assert bot_file != parser_file
 
-    def test_can_write_to_log_dir_success(self, temp_log_dir):
+    def test_can_write_to_log_dir_success(self, shared_log_manager):
         """Тест успешной проверки прав на запись."""
-        log_manager = LogManager(log_dir=temp_log_dir)
-
-        result = log_manager.can_write_to_log_dir()
+        result = shared_log_manager.can_write_to_log_dir()
 
         assert result is True
 
@@ -65,10 +85,32 @@ class TestLogManager:
         """Тест неудачной проверки прав на запись."""
         log_manager = LogManager(log_dir=temp_log_dir)
 
-        # Мокаем ошибку прав доступа, патча операции с файлами
-        with patch.object(Path, "touch", side_effect=PermissionError("Access denied")):
-            result = log_manager.can_write_to_log_dir()
-            assert result is False
+        # Мокаем отсутствие прав на запись
+        with patch("utils.log_manager._probe_dir_writable", return_value=False) as mock_probe:
+            assert log_manager.can_write_to_log_dir() is False
+            # Повторный вызов берет результат из кэша
+            assert log_manager.can_write_to_log_dir() is False
+            mock_probe.assert_called_once()
+
+    def test_can_write_to_log_dir_probe_denied(self, temp_log_dir):
+        """Тест того, что отказ при пробном открытии файла означает отсутствие прав."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        log_manager.wait_for_cleanup()
+
+        with patch("os.open", side_effect=PermissionError("Access denied")):
+            with patch("os.access", return_value=False):
+                assert log_manager.can_write_to_log_dir() is False
+
+    def test_can_write_to_log_dir_cache_expires(self, temp_log_dir):
+        """Тест повторной проверки прав после истечения срока кэша."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+
+        with patch("utils.log_manager._probe_dir_writable", return_value=False):
+            assert log_manager.can_write_to_log_dir() is False
+
+        # Срок кэша истек - права проверяются заново
+        log_manager._write_ok_until = time.monotonic()
+        assert log_manager.can_write_to_log_dir() is True
 
     def test_can_write_to_log_dir_nonexistent(self):
         """Тест проверки прав на запись с несуществующей директорией."""
@@ -79,14 +121,24 @@ class TestLogManager:
             with pytest.raises((FileNotFoundError, PermissionError)):
                 LogManager(log_dir=non_existent_dir)
 
-    def test_get_writable_file_path_success(self, temp_log_dir):
+    def test_get_writable_file_path_success(self, shared_log_manager):
         """Тест успешного получения пути к записываемому файлу."""
+        file_path = shared_log_manager.get_writable_file_path("test.log")
+
+        assert file_path is not None
+        assert file_path.parent == shared_log_manager.log_dir
+
+    def test_get_writable_file_path_without_probe_files(self, temp_log_dir):
+        """Тест того, что проверка прав не создает пробных файлов и выполняется один раз."""
         log_manager = LogManager(log_dir=temp_log_dir)
 
-        file_path = log_manager.get_writable_file_path("test.log")
+        with patch("utils.log_manager._probe_dir_writable", wraps=_probe_dir_writable) as mock_probe:
+            first = log_manager.get_writable_file_path("page.html")
+            second = log_manager.get_writable_file_path("page.html")
 
-        assert file_path is not None
-        assert file_path.parent == temp_log_dir
+        assert first == second == temp_log_dir / "page.html"
+        mock_probe.assert_called_once()
+        assert list(temp_log_dir.iterdir()) == []
 
     def test_get_writable_file_path_failure(self, temp_log_dir):
         """Тест неудачного получения пути к записываемому файлу."""
@@ -120,15 +172,16 @@ class TestLogManager:
             logger = log_manager.setup_logging("test", logging.INFO)
 
             assert logger is not None
-            # Должен все еще иметь консольный обработчик
+            # Должен все еще иметь консольный обработчик, и только его
             assert len(logger.handlers) > 0
+            assert all(type(handler) is logging.StreamHandler for handler in logger.handlers)
 
     def test_setup_logging_file_handler_error(self, temp_log_dir):
         """Тест настройки логирования с ошибкой обработчика файлов."""
         log_manager = LogManager(log_dir=temp_log_dir)
 
-        # Мокаем неудачное создание FileHandler
-        with patch("logging.FileHandler", side_effect=Exception("Handler error")):
+        # Мокаем неудачное создание файлового обработчика
+        with patch("utils.log_manager.DailyLogFileHandler", side_effect=Exception("Handler error")):
             logger = log_manager.setup_logging("test", logging.INFO)
 
             # Должен переключиться на логирование только в консоль
@@ -146,28 +199,38 @@ class TestLogManager:
         old_file = temp_log_dir / "bot_old.log"
         recent_file = temp_log_dir / "bot_recent.log"
 
-        old_file.write_text("old log content")
-        recent_file.write_text("recent log content")
+        old_file.write_bytes(b"old log content")
+        recent_file.write_bytes(b"recent log content")
 
-        # Мокаем os.path.getctime для возврата разных возрастов файлов
-        def mock_getctime(path):
-            today = datetime.now()
-            if "old" in str(path):
-                return (today - timedelta(days=10)).timestamp()
-            else:
-                return (today - timedelta(days=3)).timestamp()
+        # Выставляем файлам время последней записи 10 и 3 дня назад
+        now = time.time()
+        os.utime(old_file, (now, now - 10 * 86400))
+        os.utime(recent_file, (now, now - 3 * 86400))
 
-        with patch("os.path.getctime", side_effect=mock_getctime):
-            with patch("os.remove") as mock_remove:
-                # Запускаем очистку
-                deleted_count = log_manager.cleanup_old_logs()
+        deleted_count = log_manager.cleanup_old_logs()
+
+        # Удален должен быть только старый файл
+        assert deleted_count == 1
+        assert not old_file.exists()
+        assert recent_file.exists()
+
+    def test_cleanup_old_logs_skips_recent_dates_by_name(self, temp_log_dir):
+        """Тест того, что логи со свежей датой в имени не проверяются по времени изменения."""
+        log_manager = LogManager(log_dir=temp_log_dir, retention_days=7)
+        log_manager.wait_for_cleanup()
+        today = datetime.now().strftime("%Y-%m-%d")
+        recent_file = temp_log_dir / f"bot_{today}.log"
+        old_file = temp_log_dir / "bot_2025-01-01.log"
+        for log_file in (recent_file, old_file):
+            log_file.write_bytes(b"log content")
+            os.utime(log_file, (0, 0))
+
+        deleted_count = log_manager.cleanup_old_logs()
 
-                # Старый файл должен быть удален (мок будет вызван)
-                assert deleted_count == 1
-                mock_remove.assert_called_once()
-                # Проверяем, что была попытка удалить правильный файл
-                called_path = str(mock_remove.call_args[0][0])
-                assert "bot_old.log" in called_path
+        # Свежий по имени файл остается, даже если время изменения старое
+        assert deleted_count == 1
+        assert recent_file.exists()
+        assert not old_file.exists()
 
     def test_cleanup_old_logs_no_files(self, temp_log_dir):
         """Тест очистки без файлов логов."""
@@ -179,27 +242,73 @@ class TestLogManager:
         # Директория должна все еще существовать
         assert temp_log_dir.exists()
 
+    def test_cleanup_old_logs_in_background_on_init(self, temp_log_dir):
+        """Тест фонового удаления старых логов при инициализации."""
+        old_file = temp_log_dir / "bot_2025-01-01.log"
+        old_file.write_bytes(b"old log content")
+        os.utime(old_file, (0, 0))
+
+        log_manager = LogManager(log_dir=temp_log_dir, retention_days=7)
+        log_manager.wait_for_cleanup()
+
+        assert not old_file.exists()
+
+    def test_background_cleanup_runs_once_per_day(self, temp_log_dir):
+        """Тест того, что фоновая очистка в течение дня запускается только один раз."""
+        log_manager = LogManager(log_dir=temp_log_dir, retention_days=7)
+        log_manager.wait_for_cleanup()
+        old_file = temp_log_dir / "bot_2025-01-01.log"
+        old_file.write_bytes(b"old log content")
+        os.utime(old_file, (0, 0))
+
+        # Очистка при инициализации уже была сегодня
+        assert log_manager.cleanup_old_logs(wait=False) == 0
+        assert old_file.exists()
+
+        # Явный вызов не ограничивается
+        assert log_manager.cleanup_old_logs() == 1
+
     def test_cleanup_old_logs_permission_error(self, temp_log_dir):
         """Тест очистки с ошибкой прав доступа."""
         log_manager = LogManager(log_dir=temp_log_dir)
+        log_manager.wait_for_cleanup()
 
         # Создаем тестовый файл
         test_file = temp_log_dir / "test_2025-01-01.log"
-        test_file.write_text("test content")
+        test_file.write_bytes(b"test content")
+        os.utime(test_file, (0, 0))
 
         # Мокаем ошибку прав доступа при unlink
-        with patch.object(Path, "unlink", side_effect=PermissionError("Access denied")):
+        with patch("os.unlink", side_effect=PermissionError("Access denied")):
             # Не должно вызывать ошибку
-            log_manager.cleanup_old_logs()
+            deleted_count = log_manager.cleanup_old_logs()
+
+        assert deleted_count == 0
+        assert test_file.exists()
+
+    def test_cleanup_old_logs_read_only_directory(self, temp_log_dir):
+        """Тест того, что без прав на папку логов удаление файлов не запускается."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        log_manager.wait_for_cleanup()
+        old_file = temp_log_dir / "bot_2025-01-01.log"
+        old_file.write_bytes(b"old log content")
+        os.utime(old_file, (0, 0))
+
+        with patch.object(log_manager, "can_write_to_log_dir", return_value=False):
+            with patch("os.unlink") as mock_unlink:
+                deleted_count = log_manager.cleanup_old_logs()
+
+        assert deleted_count == 0
+        mock_unlink.assert_not_called()
 
     def test_get_log_stats(self, temp_log_dir):
         """Тест получения статистики логов."""
         log_manager = LogManager(log_dir=temp_log_dir)
 
         # Создаем тестовые файлы логов
-        (temp_log_dir / "bot_2025-09-27.log").write_text("bot log content")
-        (temp_log_dir / "parser_2025-09-27.log").write_text("parser log content" * 100)
-        (temp_log_dir / "database_2025-09-26.log").write_text("db log")
+        (temp_log_dir / "bot_2025-09-27.log").write_bytes(b"bot log content")
+        (temp_log_dir / "parser_2025-09-27.log").write_bytes(b"parser log content" * 100)
+        (temp_log_dir / "database_2025-09-26.log").write_bytes(b"db log")
 
         stats = log_manager.get_log_stats()
 
@@ -207,6 +316,22 @@ class TestLogManager:
         assert stats["total_size"] > 0
         assert stats["retention_days"] == log_manager.retention_days
         assert "by_type" in stats
+        assert stats["by_type"]["parser"] == {"count": 1, "size": len("parser log content") * 100}
+
+    def test_get_log_stats_counts_regular_files_only(self, temp_log_dir, tmp_path):
+        """Тест того, что ссылки и папки с суффиксом .log не попадают в статистику."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        target = tmp_path / "outside.bin"
+        target.write_bytes(b"x" * 100_000)
+        (temp_log_dir / "link_2025-09-27.log").symlink_to(target)
+        (temp_log_dir / "archive.log").mkdir()
+        (temp_log_dir / "bot_2025-09-27.log").write_bytes(b"bot log content")
+
+        stats = log_manager.get_log_stats()
+
+        assert stats["total_files"] == 1
+        assert stats["total_size"] == len(b"bot log content")
+        assert list(stats["by_type"]) == ["bot"]
 
     def test_get_log_stats_empty_directory(self, temp_log_dir):
         """Тест получения статистики логов с пустой директорией."""
@@ -222,8 +347,8 @@ class TestLogManager:
         """Тест получения статистики логов с ошибкой прав доступа."""
         log_manager = LogManager(log_dir=temp_log_dir)
 
-        # Мокаем glob для вызова ошибки прав доступа
-        with patch.object(Path, "glob", side_effect=PermissionError("Access denied")):
+        # Мокаем scandir для вызова ошибки прав доступа
+        with patch("os.scandir", side_effect=PermissionError("Access denied")):
             stats = log_manager.get_log_stats()
 
             # Должен возвращать безопасные значения по умолчанию
@@ -254,8 +379,7 @@ class TestGetLogManager:
     def test_get_log_manager_creates_instance(self):
         """Тест того, что get_log_manager создает экземпляр LogManager."""
         # Очищаем любой существующий экземпляр
-        if hasattr(get_log_manager, "_instance"):
-            delattr(get_log_manager, "_instance")
+        reset_log_manager()
 
         manager = get_log_manager()
 
@@ -266,15 +390,22 @@ class TestGetLogManager:
     def test_get_log_manager_singleton_behavior(self):
         """Тест того, что get_log_manager ведет себя как синглтон."""
         # Очищаем любой существующий экземпляр
-        if hasattr(get_log_manager, "_instance"):
-            delattr(get_log_manager, "_instance")
+        reset_log_manager()
 
         manager1 = get_log_manager()
         manager2 = get_log_manager()
 
         # Должен возвращать тот же экземпляр при последующих вызовах
-        assert manager1.log_dir == manager2.log_dir
-        assert manager1.retention_days == manager2.retention_days
+        assert manager1 is manager2
+
+    def test_get_log_manager_concurrent_first_call(self):
+        """Тест того, что одновременный первый вызов из нескольких потоков создает один экземпляр."""
+        reset_log_manager()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            managers = list(pool.map(lambda _: get_log_manager(), range(8)))
+
+        assert all(manager is managers[0] for manager in managers)
 
 
 class TestLogManagerIntegration:
@@ -292,16 +423,202 @@ class TestLogManagerIntegration:
         logger.warning("Test warning message")
         logger.error("Test error message")
 
-        # Проверяем, что файл лога был создан
+        # Записи пишутся в фоновом потоке: закрытие дожидается их записи в файл
+        log_manager.close()
+
         today = datetime.now().strftime("%Y-%m-%d")
         log_file = temp_log_dir / f"integration_test_{today}.log"
+        content = log_file.read_text()
+        assert "Test info message" in content
+        assert "Test warning message" in content
+        assert "Test error message" in content
+        assert logger.handlers == []
+
+    def test_daily_file_handler_rollover(self, temp_log_dir):
+        """Тест перехода файлового обработчика на файл нового дня после полуночи."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        log_manager._cached_date_str = "2000-01-01"
+        log_manager._date_valid_until = time.time() + 60
+        handler = DailyLogFileHandler(log_manager, "rollover")
+        record = logging.makeLogRecord({"msg": "after midnight"})
+
+        # Полночь прошла
+        log_manager._date_valid_until = 0.0
+        handler._rollover_at = 0.0
+        handler.handle(record)
+        handler.close()
+
+        today_file = log_manager.get_daily_log_file("rollover")
+        # В файл прошедшего дня ничего не писали - он и не создавался
+        assert not (temp_log_dir / "rollover_2000-01-01.log").exists()
+        assert "after midnight" in today_file.read_text()
+        assert handler._rollover_at > time.time()
+
+    def test_daily_file_handler_size_rotation(self, temp_log_dir):
+        """Тест переименования переполненного файла дня с проверкой размера раз в несколько записей."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        handler = DailyLogFileHandler(log_manager, "sized")
+        handler.max_bytes = 10
+        handler.sample_every = 2
+        log_file = log_manager.get_daily_log_file("sized")
+
+        for number in range(3):
+            handler.handle(logging.makeLogRecord({"msg": f"record {number}"}))
+        handler.close()
+
+        rotated_file = temp_log_dir / f"{log_file.stem}.1.log"
+        assert "record 0" in rotated_file.read_text()
+        assert "record 1" in rotated_file.read_text()
+        assert log_file.read_text().strip() == "record 2"
+
+    def test_daily_file_handler_reports_open_error(self, temp_log_dir):
+        """Тест того, что ошибка открытия файла сообщается через handleError, а не выходит из emit."""
+        log_dir = temp_log_dir / "removed"
+        log_manager = LogManager(log_dir=log_dir)
+        log_manager.wait_for_cleanup()
+        handler = DailyLogFileHandler(log_manager, "missing_dir")
+        log_dir.rmdir()
+
+        with patch.object(handler, "handleError") as mock_handle_error:
+            handler.handle(logging.makeLogRecord({"msg": "lost"}))
+        handler.close()
+
+        mock_handle_error.assert_called_once()
+
+    def test_daily_file_handler_does_not_reopen_after_close(self, temp_log_dir):
+        """Тест того, что запись после close() не открывает файл заново."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        handler = DailyLogFileHandler(log_manager, "after_close")
+        handler.close()
+
+        handler.handle(logging.makeLogRecord({"msg": "too late"}))
+
+        assert not log_manager.get_daily_log_file("after_close").exists()
+
+    def test_daily_file_handler_reports_size_check_error(self, temp_log_dir):
+        """Тест того, что ошибка проверки размера сообщается через handleError, а не выходит из emit."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        handler = DailyLogFileHandler(log_manager, "size_error")
+        handler.sample_every = 1
+
+        with patch("utils.log_manager.os.fstat", side_effect=OSError("fstat failed")):
+            with patch.object(handler, "handleError") as mock_handle_error:
+                handler.handle(logging.makeLogRecord({"msg": "record"}))
+        handler.close()
+
+        mock_handle_error.assert_called_once()
+        assert "record" in log_manager.get_daily_log_file("size_error").read_text()
+
+    def test_daily_file_handler_reports_write_error(self, temp_log_dir):
+        """Тест того, что ошибка записи пачки сообщается через handleError, а не выходит из flush."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        handler = DailyLogFileHandler(log_manager, "write_error")
+        handler.handle(logging.makeLogRecord({"msg": "first"}))
+        handler.handle(logging.makeLogRecord({"msg": "second"}))
 
-        # Файл должен существовать, если запись прошла успешно
-        if log_file.exists():
-            content = log_file.read_text()
-            assert "Test info message" in content
-            assert "Test warning message" in content
-            assert "Test error message" in content
+        with patch("utils.log_manager._write_all", side_effect=OSError(errno.ENOSPC, "No space left on device")):
+            with patch.object(handler, "handleError") as mock_handle_error:
+                handler.flush()
+        handler.close()
+
+        mock_handle_error.assert_called_once()
+        assert mock_handle_error.call_args.args[0].args[0] == 2
+
+    def test_buffered_handler_writes_batch_on_flush(self, temp_log_dir):
+        """Тест того, что накопленные записи попадают в файл одной пачкой при сбросе."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        file_handler = DailyLogFileHandler(log_manager, "batched")
+        handler = BufferedLogHandler(16, flushLevel=logging.ERROR, target=file_handler)
+        log_file = log_manager.get_daily_log_file("batched")
+
+        handler.handle(logging.makeLogRecord({"msg": "first", "levelno": logging.INFO}))
+        handler.handle(logging.makeLogRecord({"msg": "second", "levelno": logging.INFO}))
+        assert not log_file.exists()
+
+        # ERROR сбрасывает всю пачку, файл дописан без закрытия обработчика
+        handler.handle(logging.makeLogRecord({"msg": "third", "levelno": logging.ERROR}))
+        assert log_file.read_text().split() == ["first", "second", "third"]
+
+        handler.close()
+        file_handler.close()
+
+    def test_buffered_handler_reports_target_flush_error(self, temp_log_dir):
+        """Тест того, что ошибка сброса файлового обработчика не выходит из BufferedLogHandler.flush."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        file_handler = DailyLogFileHandler(log_manager, "target_error")
+        handler = BufferedLogHandler(16, flushLevel=logging.ERROR, target=file_handler)
+        handler.handle(logging.makeLogRecord({"msg": "buffered", "levelno": logging.INFO}))
+
+        with patch.object(file_handler, "flush", side_effect=OSError("flush failed")):
+            with patch.object(handler, "handleError") as mock_handle_error:
+                handler.flush()
+        handler.close()
+        file_handler.close()
+
+        mock_handle_error.assert_called_once()
+
+    def test_lone_info_record_is_flushed_by_timer(self, temp_log_dir):
+        """Тест того, что одиночная INFO-запись попадает в файл без ERROR и без close()."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        with patch("utils.log_manager.LOG_FLUSH_INTERVAL", 0.05):
+            logger = log_manager.setup_logging("timer_flush", logging.INFO)
+        log_file = log_manager.get_daily_log_file("timer_flush")
+
+        logger.info("Lone info message")
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if log_file.exists() and "Lone info message" in log_file.read_text():
+                break
+            time.sleep(0.01)
+        content = log_file.read_text() if log_file.exists() else ""
+        log_manager.close()
+
+        assert "Lone info message" in content
+
+    def test_queue_listener_survives_file_write_error(self, temp_log_dir):
+        """Тест того, что ошибка записи в файл не останавливает фоновый поток и консольный вывод."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        logger = log_manager.setup_logging("listener_error", logging.INFO)
+        queue_handler = log_manager._configured_loggers["listener_error"]
+        console_output = io.StringIO()
+        for handler in queue_handler.listener.handlers:
+            if not isinstance(handler, BufferedLogHandler):
+                handler.setStream(console_output)
+
+        with patch("utils.log_manager._write_all", side_effect=OSError(errno.ENOSPC, "No space left on device")):
+            with patch.object(DailyLogFileHandler, "handleError") as mock_handle_error:
+                logger.error("first")
+                logger.error("second")
+
+                deadline = time.monotonic() + 5
+                while time.monotonic() < deadline and "second" not in console_output.getvalue():
+                    time.sleep(0.01)
+                listener_alive = queue_handler.listener._thread.is_alive()
+        log_manager.close()
+
+        assert mock_handle_error.called
+        assert listener_alive
+        assert "first" in console_output.getvalue()
+        assert "second" in console_output.getvalue()
+
+    def test_daily_file_handler_writes_pending_records_with_one_writev(self, temp_log_dir):
+        """Тест того, что накопленные записи уходят в файл одним вызовом os.writev."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+        handler = DailyLogFileHandler(log_manager, "vectored")
+        for number in range(3):
+            handler.handle(logging.makeLogRecord({"msg": f"record {number}"}))
+
+        with patch("utils.log_manager.os.writev", wraps=os.writev) as writev:
+            handler.flush()
+        handler.close()
+
+        writev.assert_called_once()
+        assert log_manager.get_daily_log_file("vectored").read_text().splitlines() == [
+            "record 0",
+            "record 1",
+            "record 2",
+        ]
 
     def test_logger_configuration_isolation(self, temp_log_dir):
         """Тест того, что разные логгеры правильно изолированы."""
@@ -314,6 +631,17 @@ class TestLogManagerIntegration:
         assert logger1.level == logging.INFO
         assert logger2.level == logging.DEBUG
 
+    def test_setup_logging_reconfigure_level(self, temp_log_dir):
+        """Тест того, что повторная настройка логгера меняет только уровень."""
+        log_manager = LogManager(log_dir=temp_log_dir)
+
+        handlers = list(log_manager.setup_logging("reconfigure", logging.INFO).handlers)
+        logger = log_manager.setup_logging("reconfigure", logging.DEBUG)
+
+        assert logger.handlers == handlers
+        assert logger.level == logging.DEBUG
+        assert all(handler.level == logging.DEBUG for handler in logger.handlers)
+
     def test_log_rotation_behavior(self, temp_log_dir):
         """Тест поведения ротации логов между днями."""
         log_manager = LogManager(log_dir=temp_log_dir)
@@ -325,8 +653,8 @@ class TestLogManagerIntegration:
         yesterday_file = temp_log_dir / f"rotation_test_{yesterday}.log"
         today_file = temp_log_dir / f"rotation_test_{today}.log"
 
-        yesterday_file.write_text("Yesterday's logs")
-        today_file.write_text("Today's logs")
+        yesterday_file.write_bytes(b"Yesterday's logs")
+        today_file.write_bytes(b"Today's logs")
 
         # Оба файла должны рассматриваться как отдельные
         assert yesterday_file.exists()
@@ -349,6 +677,8 @@ class TestLogManagerIntegration:
 
         # Должен обрабатывать параллельный доступ корректно
         assert len(loggers) == 3
+        # Повторная настройка не подключает новые обработчики
+        assert all(logger.handlers == loggers[0].handlers for logger in loggers)
 
 
 class TestLogManagerErrorHandling:
@@ -371,18 +701,25 @@ class TestLogManagerErrorHandling:
 
     def test_log_directory_creation_failure(self):
         """Тест обработки неудачного создания директории логов."""
-        with patch("pathlib.Path.mkdir", side_effect=PermissionError("Cannot create directory")):
+        with patch("os.mkdir", side_effect=PermissionError("Cannot create directory")):
             # Должен вызывать исключение во время инициализации
             with pytest.raises(PermissionError):
                 LogManager(log_dir=Path("/root/cannot_create"))
 
+    def test_existing_log_directory_is_not_recreated(self, temp_log_dir):
+        """Тест того, что для существующей директории логов mkdir не вызывается."""
+        with patch("os.mkdir") as mock_mkdir:
+            LogManager(log_dir=temp_log_dir)
+
+        mock_mkdir.assert_not_called()
+
     def test_corrupted_log_file_handling(self, temp_log_dir):
         """Тест обработки поврежденных файлов логов."""
         log_manager = LogManager(log_dir=temp_log_dir)
 
         # Создаем "поврежденный" файл (пустой файл со странным именем)
         corrupted_file = temp_log_dir / "corrupted_log_file"
-        corrupted_file.write_text("")
+        corrupted_file.write_bytes(b"")
 
         # Должен обрабатывать корректно во время сбора статистики
         stats = log_manager.get_log_stats()
@@ -400,9 +737,15 @@ class TestLogManagerErrorHandling:
         # Должен обрабатывать большие значения без ошибки
         assert log_manager.retention_days == 999999
 
+        # Даже файл с временем изменения в начале эпохи еще не устарел
+        ancient_file = temp_log_dir / "bot_1970-01-01.log"
+        ancient_file.write_bytes(b"ancient log content")
+        os.utime(ancient_file, (0, 0))
+
         # Очистка должна все еще работать (хотя ничего не удалит) и не вызывать OverflowError
         deleted_count = log_manager.cleanup_old_logs()
         assert deleted_count == 0  # Не должно ничего удалять с таким большим удержанием
+        assert ancient_file.exists()
 
 
 class TestLogManagerEnvironmentIntegration:
@@ -423,6 +766,14 @@ class TestLogManagerEnvironmentIntegration:
         log_manager = LogManager(log_dir=temp_log_dir, retention_days=30)
         assert log_manager.retention_days == 30
 
+    @pytest.mark.parametrize("raw, expected", [("15", 15), ("invalid", 30)])
+    def test_get_log_manager_reads_retention_from_environment(self, raw, expected):
+        """Тест того, что общий менеджер берет срок хранения из окружения, а неверное значение заменяет на 30."""
+        with patch.dict("os.environ", {"LOG_RETENTION_DAYS": raw}):
+            reset_log_manager()
+            assert get_log_manager().retention_days == expected
+        reset_log_manager()
+
     def test_missing_environment_variable(self, temp_log_dir):
         """Тест поведения при отсутствии переменной окружения."""
         # Очищаем переменную окружения
@@ -452,14 +803,25 @@ class TestLogManagerFileOperations:
         # Файл может существовать сейчас (зависит от буферизации)
         # Мы не проверяем существование здесь, так как это зависит от деталей реализации
 
-    def test_multiple_log_types_same_day(self, temp_log_dir):
-        """Тест нескольких типов логов в один день."""
+    def test_log_file_created_on_first_record(self, temp_log_dir):
+        """Тест того, что файл лога создается только при первой записи."""
         log_manager = LogManager(log_dir=temp_log_dir)
+        logger = log_manager.setup_logging("lazy_file", logging.INFO)
+        log_file = log_manager.get_daily_log_file("lazy_file")
 
+        assert not log_file.exists()
+
+        logger.error("First record")
+        log_manager.close()
+
+        assert "First record" in log_file.read_text()
+
+    def test_multiple_log_types_same_day(self, shared_log_manager):
+        """Тест нескольких типов логов в один день."""
         # Получаем разные типы файлов логов
-        bot_file = log_manager.get_daily_log_file("bot")
-        parser_file = log_manager.get_daily_log_file("parser")
-        db_file = log_manager.get_daily_log_file("database")
+        bot_file = shared_log_manager.get_daily_log_file("bot")
+        parser_file = shared_log_manager.get_daily_log_file("parser")
+        db_file = shared_log_manager.get_daily_log_file("database")
 
         # Все должны быть разными файлами
         assert bot_file != parser_file
@@ -467,6 +829,6 @@ class TestLogManagerFileOperations:
         assert bot_file != db_file
 
         # Все должны быть в одной директории
-        assert bot_file.parent == temp_log_dir
-        assert parser_file.parent == temp_log_dir
-        assert db_file.parent == temp_log_dir
+        assert bot_file.parent == shared_log_manager.log_dir
+        assert parser_file.parent == shared_log_manager.log_dir
+        assert db_file.parent == shared_log_manager.log_dir
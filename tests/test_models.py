@@ -2,23 +2,140 @@
 Рабочие тесты для реальных моделей проекта
 """
 
+from contextlib import nullcontext
 from datetime import datetime
 from decimal import Decimal
+from types import MappingProxyType
 
 import pytest
 from pydantic import ValidationError
 
 from models.fiscal_models import Item, SerbianFiscalData
 
+# Значения, общие для нескольких тестов: Decimal и datetime создаются один раз при импорте модуля
+TOTAL_183_96 = Decimal("183.96")
+TOTAL_100 = Decimal("100.00")
+QUANTITY_1 = Decimal("1")
+SDC_DATE_TIME = datetime(2025, 9, 27, 10, 30, 0)
+
+# Списки товаров для вариантов базовых данных; кортежи, чтобы тесты не меняли их на месте
+MULTIPLE_ITEMS = (
+    {"name": "Item 1", "quantity": Decimal("2"), "price": Decimal("50.00"), "sum": TOTAL_100},
+    {"name": "Item 2", "quantity": QUANTITY_1, "price": Decimal("83.96"), "sum": Decimal("83.96")},
+)
+SPECIAL_CHARACTER_ITEMS = ({"name": "Производ ćčŽšđ", "quantity": QUANTITY_1, "price": TOTAL_100, "sum": TOTAL_100},)
+
+# Данные реальных чеков только для чтения; тестам, которым нужны другие значения, нужна копия
+GROCERY_DATA = MappingProxyType(
+    {
+        "tin": "987654321",
+        "shop_name": "Maxi Market",
+        "shop_address": "Bulevar oslobođenja 123",
+        "city": "Novi Sad",
+        "administrative_unit": "Novi Sad",
+        "invoice_number": "MAXI-001-789",
+        "total_amount": Decimal("1247.50"),
+        "transaction_type_counter": 1,
+        "total_counter": 1001,
+        "invoice_counter_extension": "NS-001",
+        "signed_by": "POS System",
+        "sdc_date_time": datetime(2025, 9, 27, 14, 25, 30),
+        "requested_by": "Customer",
+        "invoice_type": "RETAIL",
+        "transaction_type": "SALE",
+        "status": "COMPLETED",
+        "items": [
+            {
+                "name": "Hleb integralni 500g",
+                "quantity": Decimal("2"),
+                "price": Decimal("89.99"),
+                "sum": Decimal("179.98"),
+            },
+            {
+                "name": "Mleko 2.8% 1L",
+                "quantity": Decimal("3"),
+                "price": Decimal("119.99"),
+                "sum": Decimal("359.97"),
+            },
+            {
+                "name": "Jaja A klasa 10kom",
+                "quantity": QUANTITY_1,
+                "price": Decimal("299.99"),
+                "sum": Decimal("299.99"),
+            },
+            {
+                "name": "Banana 1kg",
+                "quantity": Decimal("1.245"),
+                "price": Decimal("329.99"),
+                "sum": Decimal("407.56"),  # 1.245 * 329.99 ≈ 407.56
+            },
+        ],
+    }
+)
+
+RESTAURANT_DATA = MappingProxyType(
+    {
+        "tin": "111222333",
+        "shop_name": "Restoran Tri Šešira",
+        "shop_address": "Skadarlija 29",
+        "city": "Beograd",
+        "administrative_unit": "Stari Grad",
+        "invoice_number": "TRI-002-456",
+        "total_amount": Decimal("3450.00"),
+        "transaction_type_counter": 5,
+        "total_counter": 2050,
+        "invoice_counter_extension": "SG-002",
+        "signed_by": "Waiter System",
+        "sdc_date_time": datetime(2025, 9, 27, 19, 45, 15),
+        "requested_by": "Table 7",
+        "invoice_type": "RESTAURANT",
+        "transaction_type": "SALE",
+        "status": "COMPLETED",
+        "buyer_id": "VIP123",
+        "items": [
+            {
+                "name": "Ćevapi 10kom sa lepinjom",
+                "quantity": Decimal("2"),
+                "price": Decimal("890.00"),
+                "sum": Decimal("1780.00"),
+            },
+            {
+                "name": "Shopska salata",
+                "quantity": QUANTITY_1,
+                "price": Decimal("450.00"),
+                "sum": Decimal("450.00"),
+            },
+            {
+                "name": "Pivo Jelen 0.5L",
+                "quantity": Decimal("4"),
+                "price": Decimal("280.00"),
+                "sum": Decimal("1120.00"),
+            },
+            {
+                "name": "Espresso kafa",
+                "quantity": Decimal("2"),
+                "price": Decimal("150.00"),
+                "sum": Decimal("300.00"),
+            },
+        ],
+    }
+)
+
+# Ожидаемые значения для проверок реальных чеков одним сравнением
+GROCERY_EXPECTED = ("987654321", "Maxi Market", 4, Decimal("1247.50"), "Novi Sad")
+RESTAURANT_EXPECTED = ("Restoran Tri Šešira", "VIP123", "RESTAURANT")
+RESTAURANT_ITEM_NAMES = ["Ćevapi 10kom sa lepinjom", "Shopska salata", "Pivo Jelen 0.5L", "Espresso kafa"]
+
 
 class TestItemWorking:
     """Тесты для модели Item - рабочая версия."""
 
-    def test_valid_item_creation(self):
-        """Тест создания валидного товара."""
+    @pytest.mark.parametrize("quantity", [2, Decimal("2")], ids=["int", "decimal"])
+    def test_valid_item_creation(self, quantity):
+        """Тест создания валидного товара (количество целым числом и Decimal)."""
         item = Item(
             name="Test Item",
-            quantity=Decimal("2"),
+            quantity=quantity,
             price=10000,  # 100.00 в копейках
             sum=20000,  # 200.00 в копейках
             nds=2,
@@ -30,31 +147,30 @@ class TestItemWorking:
         assert item.price == 10000
         assert item.sum == 20000
 
-    def test_item_sum_validation_passes(self):
-        """Тест прохождения валидации суммы с корректными значениями."""
-        item = Item(
-            name="Valid Item",
-            quantity=Decimal("3"),
-            price=5000,
-            sum=15000,  # 3 * 5000 = 15000
-            nds=2,
-            paymentType=4,
-            productType=1,
-        )
-        assert item.sum == 15000
-
-    def test_item_sum_validation_fails(self):
-        """Тест неудачной валидации суммы с некорректными значениями."""
-        with pytest.raises(ValidationError):
-            Item(
-                name="Invalid Item",
-                quantity=Decimal("2"),
-                price=10000,
-                sum=50000,  # Неправильная сумма: должно быть 20000
+    @pytest.mark.parametrize(
+        "quantity, price, item_sum, expect_error",
+        [
+            pytest.param(Decimal("3"), 5000, 15000, False, id="exact"),  # 3 * 5000 = 15000
+            pytest.param(Decimal("2"), 10000, 50000, True, id="wrong-sum"),  # должно быть 20000
+            pytest.param(Decimal("3"), 3333, 10000, False, id="rounding"),  # 3333 * 3 = 9999, разница 1 копейка
+            pytest.param(Decimal("2"), 1000, 5000, True, id="over-tolerance"),  # должно быть 2000
+        ],
+    )
+    def test_item_sum_validation(self, quantity, price, item_sum, expect_error):
+        """Тест проверки суммы товара: сумма в пределах допуска проходит, иначе - ValidationError."""
+        expectation = pytest.raises(ValidationError) if expect_error else nullcontext()
+        with expectation:
+            item = Item(
+                name="Sum Item",
+                quantity=quantity,
+                price=price,
+                sum=item_sum,
                 nds=2,
                 paymentType=4,
                 productType=1,
             )
+        if not expect_error:
+            assert item.sum == item_sum
 
     def test_item_sum_tolerance_6_percent(self):
         """Сумма проходит при погрешности из-за округления количества (например 1.157→1.16)."""
@@ -75,7 +191,7 @@ class TestItemWorking:
         with pytest.raises(ValidationError):
             Item(
                 name="Bad Item",
-                quantity=Decimal("1"),
+                quantity=QUANTITY_1,
                 price=10000,
                 sum=12000,  # 20% ошибка
                 nds=2,
@@ -84,12 +200,14 @@ class TestItemWorking:
             )
 
 
-class TestSerbianFiscalDataWorking:
-    """Тесты для модели SerbianFiscalData - рабочая версия."""
+@pytest.fixture(scope="module")
+def valid_serbian_dict():
+    """Валидные сербские фискальные данные, общие на модуль.
 
-    def get_valid_serbian_data(self):
-        """Вспомогательный метод для получения валидных сербских фискальных данных."""
-        return {
+    Словарь только для чтения: тесты, которым нужны другие значения, собирают копию через {**valid_serbian_dict, ...}.
+    """
+    return MappingProxyType(
+        {
             # Информация о продавце
             "tin": "123456789",
             "shop_name": "Test Shop",
@@ -98,12 +216,12 @@ class TestSerbianFiscalDataWorking:
             "administrative_unit": "Novi Beograd",
             # Информация о чеке
             "invoice_number": "ABCD-123-456",
-            "total_amount": Decimal("183.96"),
+            "total_amount": TOTAL_183_96,
             "transaction_type_counter": 456,
             "total_counter": 123,
             "invoice_counter_extension": "EXT-001",
             "signed_by": "System",
-            "sdc_date_time": datetime(2025, 9, 27, 10, 30, 0),
+            "sdc_date_time": SDC_DATE_TIME,
             # Дополнительная информация
             "requested_by": "Customer",
             "invoice_type": "NORMAL",
@@ -111,70 +229,82 @@ class TestSerbianFiscalDataWorking:
             # Статус
             "status": "COMPLETED",
             # Товары
-            "items": [
-                {"name": "Test Item", "quantity": Decimal("1"), "price": Decimal("183.96"), "sum": Decimal("183.96")}
-            ],
+            "items": [{"name": "Test Item", "quantity": QUANTITY_1, "price": TOTAL_183_96, "sum": TOTAL_183_96}],
         }
+    )
+
+
+@pytest.fixture(scope="module")
+def valid_serbian_model(valid_serbian_dict):
+    """Модель SerbianFiscalData из valid_serbian_dict, созданная один раз на модуль."""
+    return SerbianFiscalData(**valid_serbian_dict)
+
+
+@pytest.fixture(scope="session")
+def grocery_model():
+    """Модель продуктового чека, провалидированная один раз на сессию."""
+    return SerbianFiscalData(**GROCERY_DATA)
+
+
+@pytest.fixture(scope="session")
+def restaurant_model():
+    """Модель ресторанного чека, провалидированная один раз на сессию."""
+    return SerbianFiscalData(**RESTAURANT_DATA)
+
+
+class TestSerbianFiscalDataWorking:
+    """Тесты для модели SerbianFiscalData - рабочая версия."""
 
-    def test_valid_serbian_data_creation(self):
+    def test_valid_serbian_data_creation(self, valid_serbian_model):
         """Тест создания валидных сербских фискальных данных."""
-        data = SerbianFiscalData(**self.get_valid_serbian_data())
+        data = valid_serbian_model
 
         assert data.tin == "123456789"
         assert data.shop_name == "Test Shop"
-        assert data.total_amount == Decimal("183.96")
+        assert data.total_amount == TOTAL_183_96
         assert len(data.items) == 1
         assert data.status == "COMPLETED"
 
-    def test_serbian_data_with_optional_buyer_id(self):
+    def test_serbian_data_with_optional_buyer_id(self, valid_serbian_dict):
         """Тест сербских данных с опциональным buyer_id."""
-        data_dict = self.get_valid_serbian_data()
-        data_dict["buyer_id"] = "BUYER123"
-
-        data = SerbianFiscalData(**data_dict)
+        # buyer_id нет в базовых данных, поэтому передаем его рядом с ними без промежуточного словаря
+        data = SerbianFiscalData(**valid_serbian_dict, buyer_id="BUYER123")
         assert data.buyer_id == "BUYER123"
 
-    def test_serbian_data_with_multiple_items(self):
+    def test_serbian_data_with_multiple_items(self, valid_serbian_dict):
         """Тест сербских данных с несколькими товарами."""
-        data_dict = self.get_valid_serbian_data()
-        data_dict["items"] = [
-            {"name": "Item 1", "quantity": Decimal("2"), "price": Decimal("50.00"), "sum": Decimal("100.00")},
-            {"name": "Item 2", "quantity": Decimal("1"), "price": Decimal("83.96"), "sum": Decimal("83.96")},
-        ]
-        data_dict["total_amount"] = Decimal("183.96")
+        data_dict = {
+            **valid_serbian_dict,
+            "items": MULTIPLE_ITEMS,
+            "total_amount": TOTAL_183_96,
+        }
 
         data = SerbianFiscalData(**data_dict)
         assert len(data.items) == 2
         assert data.items[0]["name"] == "Item 1"
         assert data.items[1]["name"] == "Item 2"
 
-    def test_serbian_data_missing_required_field(self):
+    def test_serbian_data_missing_required_field(self, valid_serbian_dict):
         """Тест валидации сербских данных с отсутствующим обязательным полем."""
-        data_dict = self.get_valid_serbian_data()
-        del data_dict["tin"]  # Удаляем обязательное поле
+        # Без обязательного поля tin; товары для этой проверки не нужны
+        data_dict = {key: value for key, value in valid_serbian_dict.items() if key != "tin"}
+        data_dict["items"] = []
 
-        with pytest.raises(ValidationError):
+        with pytest.raises(ValidationError) as exc_info:
             SerbianFiscalData(**data_dict)
+        # Ошибка ровно одна - про отсутствующий tin
+        assert [error["loc"] for error in exc_info.value.errors()] == [("tin",)]
 
-    def test_serbian_data_with_special_characters(self):
+    def test_serbian_data_with_special_characters(self, valid_serbian_dict):
         """Тест сербских данных со специальными символами."""
-        data_dict = self.get_valid_serbian_data()
-        data_dict.update(
-            {
-                "shop_name": "Тест Шоп ćčŽšđ",
-                "shop_address": "Адреса тест ćčŽšđ 123",
-                "city": "Београд",
-                "items": [
-                    {
-                        "name": "Производ ćčŽšđ",
-                        "quantity": Decimal("1"),
-                        "price": Decimal("100.00"),
-                        "sum": Decimal("100.00"),
-                    }
-                ],
-            }
-        )
-        data_dict["total_amount"] = Decimal("100.00")
+        data_dict = {
+            **valid_serbian_dict,
+            "shop_name": "Тест Шоп ćčŽšđ",
+            "shop_address": "Адреса тест ćčŽšđ 123",
+            "city": "Београд",
+            "items": SPECIAL_CHARACTER_ITEMS,
+            "total_amount": TOTAL_100,
+        }
 
         data = SerbianFiscalData(**data_dict)
         assert "ćčŽšđ" in data.shop_name
@@ -187,7 +317,7 @@ class TestModelValidationWorking:
 
     def test_item_with_zero_values(self):
         """Тест товара с нулевыми значениями."""
-        item = Item(name="Free Item", quantity=Decimal("1"), price=0, sum=0, nds=0, paymentType=4, productType=1)
+        item = Item(name="Free Item", quantity=QUANTITY_1, price=0, sum=0, nds=0, paymentType=4, productType=1)
         assert item.price == 0
         assert item.sum == 0
 
@@ -197,7 +327,7 @@ class TestModelValidationWorking:
 
         item = Item(
             name="Expensive Item",
-            quantity=Decimal("1"),
+            quantity=QUANTITY_1,
             price=large_amount,
             sum=large_amount,
             nds=2,
@@ -207,144 +337,19 @@ class TestModelValidationWorking:
         assert item.price == large_amount
         assert item.sum == large_amount
 
-    def test_item_sum_tolerance(self):
-        """Тест толерантности валидации суммы товара."""
-        # Должен проходить с небольшой разницей округления (в пределах 5 копеек)
-        item = Item(
-            name="Tolerance Test",
-            quantity=Decimal("3"),
-            price=3333,  # 33.33 копейки
-            sum=10000,  # 100.00 копеек (3333*3=9999, разница=1 копейка)
-            nds=2,
-            paymentType=4,
-            productType=1,
-        )
-        assert item.sum == 10000
-
-    def test_item_sum_exceeds_tolerance(self):
-        """Тест неудачной валидации суммы товара при превышении толерантности."""
-        with pytest.raises(ValidationError):
-            Item(
-                name="Tolerance Fail",
-                quantity=Decimal("2"),
-                price=1000,  # 10.00
-                sum=5000,  # 50.00 (должно быть 20.00, разница > 5 копеек)
-                nds=2,
-                paymentType=4,
-                productType=1,
-            )
-
 
 class TestRealWorldScenarios:
     """Тесты для реальных сценариев."""
 
-    def test_typical_grocery_receipt(self):
+    def test_typical_grocery_receipt(self, grocery_model):
         """Тест типичного сценария продуктового чека."""
-        grocery_data = {
-            "tin": "987654321",
-            "shop_name": "Maxi Market",
-            "shop_address": "Bulevar oslobođenja 123",
-            "city": "Novi Sad",
-            "administrative_unit": "Novi Sad",
-            "invoice_number": "MAXI-001-789",
-            "total_amount": Decimal("1247.50"),
-            "transaction_type_counter": 1,
-            "total_counter": 1001,
-            "invoice_counter_extension": "NS-001",
-            "signed_by": "POS System",
-            "sdc_date_time": datetime(2025, 9, 27, 14, 25, 30),
-            "requested_by": "Customer",
-            "invoice_type": "RETAIL",
-            "transaction_type": "SALE",
-            "status": "COMPLETED",
-            "items": [
-                {
-                    "name": "Hleb integralni 500g",
-                    "quantity": Decimal("2"),
-                    "price": Decimal("89.99"),
-                    "sum": Decimal("179.98"),
-                },
-                {
-                    "name": "Mleko 2.8% 1L",
-                    "quantity": Decimal("3"),
-                    "price": Decimal("119.99"),
-                    "sum": Decimal("359.97"),
-                },
-                {
-                    "name": "Jaja A klasa 10kom",
-                    "quantity": Decimal("1"),
-                    "price": Decimal("299.99"),
-                    "sum": Decimal("299.99"),
-                },
-                {
-                    "name": "Banana 1kg",
-                    "quantity": Decimal("1.245"),
-                    "price": Decimal("329.99"),
-                    "sum": Decimal("407.56"),  # 1.245 * 329.99 ≈ 407.56
-                },
-            ],
-        }
+        data = grocery_model
 
-        data = SerbianFiscalData(**grocery_data)
+        assert (data.tin, data.shop_name, len(data.items), data.total_amount, data.city) == GROCERY_EXPECTED
 
-        assert data.tin == "987654321"
-        assert data.shop_name == "Maxi Market"
-        assert len(data.items) == 4
-        assert data.total_amount == Decimal("1247.50")
-        assert "Novi Sad" in data.city
-
-    def test_restaurant_receipt(self):
+    def test_restaurant_receipt(self, restaurant_model):
         """Тест сценария ресторанного чека."""
-        restaurant_data = {
-            "tin": "111222333",
-            "shop_name": "Restoran Tri Šešira",
-            "shop_address": "Skadarlija 29",
-            "city": "Beograd",
-            "administrative_unit": "Stari Grad",
-            "invoice_number": "TRI-002-456",
-            "total_amount": Decimal("3450.00"),
-            "transaction_type_counter": 5,
-            "total_counter": 2050,
-            "invoice_counter_extension": "SG-002",
-            "signed_by": "Waiter System",
-            "sdc_date_time": datetime(2025, 9, 27, 19, 45, 15),
-            "requested_by": "Table 7",
-            "invoice_type": "RESTAURANT",
-            "transaction_type": "SALE",
-            "status": "COMPLETED",
-            "buyer_id": "VIP123",
-            "items": [
-                {
-                    "name": "Ćevapi 10kom sa lepinjom",
-                    "quantity": Decimal("2"),
-                    "price": Decimal("890.00"),
-                    "sum": Decimal("1780.00"),
-                },
-                {
-                    "name": "Shopska salata",
-                    "quantity": Decimal("1"),
-                    "price": Decimal("450.00"),
-                    "sum": Decimal("450.00"),
-                },
-                {
-                    "name": "Pivo Jelen 0.5L",
-                    "quantity": Decimal("4"),
-                    "price": Decimal("280.00"),
-                    "sum": Decimal("1120.00"),
-                },
-                {
-                    "name": "Espresso kafa",
-                    "quantity": Decimal("2"),
-                    "price": Decimal("150.00"),
-                    "sum": Decimal("300.00"),
-                },
-            ],
-        }
-
-        data = SerbianFiscalData(**restaurant_data)
+        data = restaurant_model
 
-        assert data.shop_name == "Restoran Tri Šešira"
-        assert data.buyer_id == "VIP123"
-        assert len(data.items) == 4
-        assert data.invoice_type == "RESTAURANT"
-        assert "Ćevapi" in data.items[0]["name"]
+        assert (data.shop_name, data.buyer_id, data.invoice_type) == RESTAURANT_EXPECTED
+        assert [item["name"] for item in data.items] == RESTAURANT_ITEM_NAMES
@@ -247,7 +247,7 @@ class TestFiscalParser:
         <div data-bind="text: totalAmount">183,96</div>
         """
 
-        soup = BeautifulSoup(html, "html.parser")
+        soup = BeautifulSoup(html, "lxml")
         with patch("parser.fiscal_parser.FiscalParser._setup_driver") as mock_setup:
             mock_setup.return_value = None
             parser = FiscalParser()
@@ -262,7 +262,7 @@ class TestFiscalParser:
         """Тест извлечения данных Knockout.js без элементов."""
         html = "<div>No knockout elements</div>"
 
-        soup = BeautifulSoup(html, "html.parser")
+        soup = BeautifulSoup(html, "lxml")
         with patch("parser.fiscal_parser.FiscalParser._setup_driver") as mock_setup:
             mock_setup.return_value = None
             parser = FiscalParser()
@@ -290,7 +290,7 @@ class TestFiscalParser:
         </div>
         """
 
-        soup = BeautifulSoup(html, "html.parser")
+        soup = BeautifulSoup(html, "lxml")
         with patch("parser.fiscal_parser.FiscalParser._setup_driver") as mock_setup:
             mock_setup.return_value = None
             parser = FiscalParser()
@@ -308,7 +308,7 @@ class TestFiscalParser:
         """Тест извлечения товаров Knockout.js без товаров."""
         html = "<div>No items</div>"
 
-        soup = BeautifulSoup(html, "html.parser")
+        soup = BeautifulSoup(html, "lxml")
         with patch("parser.fiscal_parser.FiscalParser._setup_driver") as mock_setup:
 
             mock_setup.return_value = None